@@ -1,5 +1,6 @@
 import os
 from flask import Flask
+from jinja2 import FileSystemBytecodeCache
 from config import Config
 from flask_migrate import Migrate
 from flask_login import LoginManager
@@ -8,6 +9,15 @@ from flask_bootstrap import Bootstrap
 
 from . import models
 from . import routes
+from . import api_v1
+from . import commands
+from . import times
+from . import principal
+from .cache import cache
+from .events import events
+from .presence import presence
+from .metrics import metrics
+from .fragments import fragments
 
 from config import Config, AdminModelView
 
@@ -15,7 +25,24 @@ app = Flask(__name__, instance_relative_config=True)
 app.config.from_object(Config)
 app.config.from_pyfile(os.path.join(app.instance_path, 'config.py'), silent=True)
 
+# First before_request and last after_request, it times the others too
+metrics.init_app(app)
+
+routes.api.add_namespace(api_v1.ns)
 routes.api.init_app(app)
+app.after_request(api_v1.compress)
+
+cache.init_app(app)
+events.init_app(app)
+presence.init_app(app)
+fragments.init_app(app)
+
+if app.config.get('JINJA_BYTECODE_CACHE'):
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(app.config.get('JINJA_BYTECODE_CACHE_DIR'))
+
+app.cli.add_command(commands.auctions)
+app.cli.add_command(commands.items)
+app.add_template_filter(times.localtime, 'localtime')
 
 models.database.init_app(app)
 migrate = Migrate(app, models.database)
@@ -27,12 +54,19 @@ login_manager.init_app(app)
 admin = Admin(app)
 admin.add_view(AdminModelView(models.User, models.database.session))
 admin.add_view(AdminModelView(models.Item, models.database.session))
+admin.add_view(AdminModelView(models.Bid, models.database.session))
+admin.add_view(AdminModelView(models.UserPresence, models.database.session))
 
 Bootstrap(app)
 
 @login_manager.user_loader
 def load_user(user_id):
-    return models.User.query.get(user_id)
+    user = principal.load_principal(user_id)
+
+    if user is not None:
+        presence.seen(user.id)
+
+    return user
 
 
 @app.shell_context_processor
@@ -40,5 +74,6 @@ def make_shell_context():
    return {
        "db": models.database,
        "User": models.User,
-       "Item": models.Item
+       "Item": models.Item,
+       "Bid": models.Bid
    }
\ No newline at end of file
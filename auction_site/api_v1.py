@@ -0,0 +1,158 @@
+import gzip
+from flask import request, current_app
+from flask_restx import Namespace, Resource, fields, marshal, abort
+
+from .models import Item, User, with_users
+from .pagination import paginate
+from .queries import active_items, users_with_items_count, users_key, USER_ORDER
+from .queries import item_sort, listing_filters, filter_items, item_facets
+from .bidding import item_bids, BID_ORDER
+from .conditional import listings_validator
+from .search import search_items, search_order, search_key
+
+ns = Namespace('v1', path='/api/v1', description="JSON API for items, users and bids")
+
+item_model = ns.model('ItemV1', {
+    'id': fields.Integer(),
+    **Item.FIELDS,
+    'current_price': fields.Float(),
+    'owner_id': fields.Integer(),
+    'owner': fields.String(attribute='owner.nick'),
+    'winner_id': fields.Integer(),
+    'winner': fields.String(attribute='winner.nick'),
+})
+
+user_model = ns.model('UserV1', {
+    'id': fields.Integer(),
+    **{name: field for name, field in User.FIELDS.items() if name != 'password'},
+    'register_date': fields.Date(),
+    'items_count': fields.Integer(),
+})
+
+bid_model = ns.model('BidV1', {
+    'id': fields.Integer(),
+    'item_id': fields.Integer(),
+    'user_id': fields.Integer(),
+    'user': fields.String(attribute='user.nick'),
+    'amount': fields.Float(),
+    'timestamp': fields.DateTime(),
+})
+
+
+def fields_mask():
+    # ?fields=id,current_price -> restx mask {id,current_price}
+    requested = request.args.get('fields')
+
+    if not requested:
+        return None
+
+    return '{' + ','.join(name.strip() for name in requested.split(',') if name.strip()) + '}'
+
+
+def marshal_page(page, model, items=None):
+    return {
+        'items': marshal(page.items if items is None else items, model, mask=fields_mask()),
+        'next': page.next_url,
+        'prev': page.prev_url,
+    }
+
+
+def compress(response):
+    # after_request hook, gzips JSON answers of the API for clients that accept it
+    if (not request.path.startswith(ns.path)
+            or response.direct_passthrough
+            or response.status_code != 200
+            or 'Content-Encoding' in response.headers
+            or 'gzip' not in request.headers.get('Accept-Encoding', '')):
+        return response
+
+    data = response.get_data()
+
+    if len(data) < current_app.config.get('API_COMPRESS_MIN_SIZE', 512):
+        return response
+
+    response.set_data(gzip.compress(data, compresslevel=current_app.config.get('API_COMPRESS_LEVEL', 6)))
+    response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+    return response
+
+#================================================================
+@ns.route('/items')
+class ItemsList(Resource):
+
+    @ns.response(200, 'Success - Page of active items')
+    @ns.param('sort', 'end_date, current_price or asking_price, a leading - sorts descending')
+    @ns.param('min_price', 'Lowest current price, included')
+    @ns.param('max_price', 'Highest current price, excluded')
+    @ns.param('seller', 'Id of the owner')
+    @ns.param('ending', 'today or week')
+    def get(self):
+        order, key = item_sort(request.args.get('sort'))
+        query = filter_items(active_items(), **listing_filters(request.args))
+        return marshal_page(paginate(query, order, key=key), item_model)
+
+
+@ns.route('/items/facets')
+class ItemsFacets(Resource):
+
+    @ns.response(200, 'Success - Numbers of active items per price bucket and ending window')
+    @ns.param('seller', 'Id of the owner')
+    def get(self):
+        facets = item_facets(request.args.get('seller', type=int), listings_validator()[0])
+        return {
+            'price': [{'min': low, 'max': high, 'count': count} for low, high, count in facets['price']],
+            'ending': facets['ending'],
+        }
+
+
+@ns.route('/items/search')
+class ItemsSearch(Resource):
+
+    @ns.response(200, 'Success - Page of matching active items, best match first')
+    @ns.response(400, 'Bad request - Missing or empty q')
+    @ns.param('q', 'Words to look for in the name or description')
+    def get(self):
+        query, rank = search_items(request.args.get('q', ''))
+
+        if query is None:
+            abort(400, "Parameter q needs at least one word")
+
+        page = paginate(query, search_order(rank), key=search_key)
+        return marshal_page(page, item_model, [item for item, _ in page.items])
+
+
+@ns.route('/items/<int:item_id>')
+class ItemDetail(Resource):
+
+    @ns.response(200, 'Success - Item is loaded')
+    @ns.response(404, 'Not found - No such item')
+    def get(self, item_id):
+        item = with_users(Item.query).get(item_id)
+
+        if not item:
+            abort(404)
+
+        return marshal(item, item_model, mask=fields_mask())
+
+
+@ns.route('/items/<int:item_id>/bids')
+class ItemBids(Resource):
+
+    @ns.response(200, 'Success - Page of bids, highest first')
+    def get(self, item_id):
+        return marshal_page(paginate(item_bids(item_id), BID_ORDER), bid_model)
+
+
+@ns.route('/users')
+class UsersList(Resource):
+
+    @ns.response(200, 'Success - Page of users')
+    def get(self):
+        page = paginate(users_with_items_count(), USER_ORDER, key=users_key)
+        users = list()
+
+        for u, items_count in page.items:
+            u.items_count = items_count
+            users.append(u)
+
+        return marshal_page(page, user_model, users)
@@ -0,0 +1,65 @@
+from enum import Enum
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload
+
+from .models import Item, Bid, Counter, database
+from .times import now
+
+
+class BidResult(Enum):
+    ACCEPTED = 'accepted'
+    OUTBID = 'outbid'
+    CLOSED = 'closed'
+    NOT_FOUND = 'not_found'
+
+
+def place_bid(item_id, user_id, amount):
+    """Raise the price of an item in one conditional UPDATE.
+
+    The price check and the write happen in the same statement, so two
+    concurrent bidders can never overwrite each other with a lower bid.
+    Accepted bids are appended to the bid history and bump the listings version in the same transaction."""
+
+    current = now()
+    accepted = Item.query.filter(
+        Item.id == item_id,
+        Item.status == Item.OPEN,
+        func.coalesce(Item.current_price, Item.asking_price, 0) < amount,
+        Item.start_date <= current,
+        Item.end_date > current
+    ).update({
+        Item.current_price: amount,
+        Item.winner_id: user_id
+    }, synchronize_session=False)
+
+    if accepted:
+        database.session.execute(Bid.__table__.insert().values(
+            item_id = item_id,
+            user_id = user_id,
+            amount = amount,
+            timestamp = current
+        ))
+        Counter.bump('listings')
+
+    database.session.commit()
+
+    if accepted:
+        return BidResult.ACCEPTED
+
+    item = database.session.query(Item.status, Item.start_date, Item.end_date).filter(Item.id == item_id).first()
+
+    if not item:
+        return BidResult.NOT_FOUND
+
+    if item.status != Item.OPEN or not item.start_date <= current < item.end_date:
+        return BidResult.CLOSED
+
+    return BidResult.OUTBID
+
+
+# Highest bid first, served by the (item_id, amount DESC) index
+BID_ORDER = [(Bid.amount, True), (Bid.id, True)]
+
+
+def item_bids(item_id):
+    return Bid.query.filter(Bid.item_id == item_id).options(joinedload(Bid.user))
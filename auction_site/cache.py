@@ -0,0 +1,275 @@
+import pickle
+import random
+import time
+from collections import OrderedDict
+from functools import wraps
+from threading import Lock
+from flask import request, make_response, current_app, g
+from flask_login import current_user
+from flask_wtf.csrf import generate_csrf
+
+# Stands in for the CSRF token in cached pages, every response gets the token of its own session
+CSRF_PLACEHOLDER = b'__cached_csrf_token__'
+
+
+class NullBackend():
+    shared = False
+
+    def get(self, key):
+        return None
+
+
+    def set(self, key, value, ttl=None):
+        pass
+
+
+    def delete(self, key):
+        pass
+
+
+    def counter(self, key):
+        return 0
+
+
+    def incr(self, key):
+        return 0
+
+
+    def clear(self):
+        pass
+
+
+class MemoryBackend():
+    # LRU with per-entry expiry, private to the worker process
+    shared = False
+
+    def __init__(self, max_entries=1024, default_ttl=30):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.entries = OrderedDict()
+        self.counters = OrderedDict()
+        self.lock = Lock()
+
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+
+            if entry is None:
+                return None
+
+            value, expires = entry
+            if expires <= time.monotonic():
+                del self.entries[key]
+                return None
+
+            self.entries.move_to_end(key)
+            return value
+
+
+    def set(self, key, value, ttl=None):
+        ttl = ttl or self.default_ttl
+
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + ttl)
+            self.entries.move_to_end(key)
+
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+
+    # Counters have an LRU of their own, one evicted comes back at a random value instead of zero.
+    # The entries of its old generation are orphaned like after an invalidation, never served again.
+    def counter(self, key):
+        with self.lock:
+            return self.touch(key, 0)
+
+
+    def incr(self, key):
+        with self.lock:
+            return self.touch(key, 1)
+
+
+    def touch(self, key, step):
+        value = self.counters.pop(key, None)
+        self.counters[key] = (random.getrandbits(48) if value is None else value) + step
+
+        while len(self.counters) > self.max_entries:
+            self.counters.popitem(last=False)
+
+        return self.counters[key]
+
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.counters.clear()
+
+
+class RedisBackend():
+    # Works with any client exposing get/set/delete/incr/scan_iter like redis.Redis
+    # Every worker sees the same entries and generations, an invalidation reaches them all
+    shared = True
+
+    def __init__(self, client, prefix='auction_site:', default_ttl=30, counter_ttl=3600):
+        self.client = client
+        self.prefix = prefix
+        self.default_ttl = default_ttl
+        self.counter_ttl = counter_ttl
+
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return pickle.loads(value) if value is not None else None
+
+
+    def set(self, key, value, ttl=None):
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=ttl or self.default_ttl)
+
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+
+    # Counters expire like entries, an expired one starts again at a random value (see MemoryBackend)
+    def counter(self, key):
+        value = self.client.get(self.prefix + key)
+
+        if value is None:
+            self.client.set(self.prefix + key, random.getrandbits(48), ex=self.counter_ttl, nx=True)
+            value = self.client.get(self.prefix + key)
+
+        return int(value)
+
+
+    def incr(self, key):
+        self.counter(key)
+        value = self.client.incr(self.prefix + key)
+        self.client.expire(self.prefix + key, self.counter_ttl)
+        return value
+
+
+    def clear(self):
+        for key in self.client.scan_iter(match=self.prefix + '*'):
+            self.client.delete(key)
+
+
+def without_csrf(body):
+    # The token of the session that rendered the page (flask_wtf keeps it in g) is not shared
+    token = g.get(current_app.config.get('WTF_CSRF_FIELD_NAME', 'csrf_token'))
+    return body.replace(token.encode(), CSRF_PLACEHOLDER) if token else body
+
+
+def with_csrf(body):
+    return body.replace(CSRF_PLACEHOLDER, generate_csrf().encode()) if CSRF_PLACEHOLDER in body else body
+
+#================================================================
+class Cache():
+
+    def __init__(self, app=None):
+        self.backend = NullBackend()
+        self.hits = 0
+        self.misses = 0
+
+        if app is not None:
+            self.init_app(app)
+
+
+    def init_app(self, app):
+        cache_type = app.config.get('CACHE_TYPE', 'memory')
+        default_ttl = app.config.get('CACHE_DEFAULT_TTL', 30)
+
+        if cache_type == 'memory':
+            self.backend = MemoryBackend(app.config.get('CACHE_MAX_ENTRIES', 1024), default_ttl)
+        elif cache_type == 'redis':
+            try:
+                import redis
+            except ImportError:
+                raise RuntimeError("CACHE_TYPE = 'redis' requires the redis package")
+
+            self.backend = RedisBackend(redis.Redis.from_url(app.config['CACHE_REDIS_URL']), default_ttl=default_ttl,
+                counter_ttl=app.config.get('CACHE_COUNTER_TTL', 3600))
+        else:
+            self.backend = NullBackend()
+
+        app.extensions['cache'] = self
+
+
+    def get(self, key):
+        value = self.backend.get(key)
+
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+        return value
+
+
+    def set(self, key, value, ttl=None):
+        self.backend.set(key, value, ttl)
+
+
+    def delete(self, key):
+        self.backend.delete(key)
+
+
+    def clear(self):
+        self.backend.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses}
+
+
+    # Entries are never deleted one by one - bumping the namespace generation orphans them
+    def generation(self, namespace):
+        return self.backend.counter(f'generation:{namespace}')
+
+
+    def invalidate(self, *namespaces):
+        for namespace in namespaces:
+            self.backend.incr(f'generation:{namespace}')
+
+
+    def key(self, namespace, *parts):
+        return ':'.join([namespace, str(self.generation(namespace)), *map(str, parts)])
+
+
+    def cached(self, namespace, ttl=None):
+        """Cache the rendered response of a GET handler per path, query string, user and the version
+        tag of @conditional. `namespace` is formatted with the view arguments, e.g. 'item:{item_id}'.
+        A CSRF token in the page is stored as a placeholder and filled in per session."""
+
+        def decorator(function):
+
+            @wraps(function)
+            def wrapper(*args, **kwargs):
+                auth = f'user{current_user.get_id()}' if current_user.is_authenticated else 'anon'
+                key = self.key(namespace.format(**kwargs), g.get('cache_tag'), request.full_path, auth)
+                cached = self.get(key)
+
+                if cached is not None:
+                    body, status, content_type = cached
+                    return make_response(with_csrf(body), status, {'Content-Type': content_type})
+
+                response = make_response(function(*args, **kwargs))
+
+                if response.status_code == 200 and not response.direct_passthrough:
+                    self.set(key, (without_csrf(response.get_data()), response.status_code, response.content_type), ttl)
+
+                return response
+
+            return wrapper
+
+        return decorator
+
+
+cache = Cache()
@@ -0,0 +1,43 @@
+from sqlalchemy import func, select
+
+from .models import Item, Bid, Counter, database
+from .events import events
+from .times import now
+
+
+def close_auctions(current=None, batch_size=1000):
+    """Close every open auction that ended by `current` (UTC), `batch_size` lots per UPDATE.
+    The winner is the author of the highest recorded bid. Returns the number of closed lots."""
+
+    current = current or now()
+    leader = select([Bid.user_id]).where(Bid.item_id == Item.id).order_by(Bid.amount.desc(), Bid.id.desc()).limit(1).as_scalar()
+    closed = 0
+
+    while True:
+        items_ids = [row.id for row in database.session.query(Item.id).filter(
+            Item.status == Item.OPEN,
+            Item.end_date <= current
+        ).order_by(Item.id).limit(batch_size)]
+
+        if not items_ids:
+            break
+
+        # Same conditions as the SELECT above, bounded by the last id instead of a long IN list
+        Item.query.filter(
+            Item.status == Item.OPEN,
+            Item.end_date <= current,
+            Item.id <= items_ids[-1]
+        ).update({
+            Item.status: Item.CLOSED,
+            Item.winner_id: func.coalesce(leader, Item.winner_id)
+        }, synchronize_session=False)
+        Counter.bump('listings')
+        database.session.commit()
+
+        for item_id in items_ids:
+            events.publish(f'item:{item_id}', {'type': 'closed', 'item_id': item_id})
+
+        events.publish('auctions', {'type': 'closed', 'items_ids': items_ids})
+        closed += len(items_ids)
+
+    return closed
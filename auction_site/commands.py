@@ -0,0 +1,96 @@
+import io
+import os
+import time
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+from .models import User
+from .closing import close_auctions
+from .importing import import_items, FORMATS
+from .exporting import export_results, export_engine, day_bounds, STATUSES
+
+auctions = AppGroup('auctions', help="Auction maintenance.")
+items = AppGroup('items', help="Bulk item import and export.")
+
+
+@auctions.command('close')
+@click.option('--batch-size', default=1000, show_default=True, help="Lots closed per UPDATE.")
+@click.option('--every', default=0, help="Keep running and repeat every N seconds.")
+def close_command(batch_size, every):
+    """Close auctions that have ended and settle their winners."""
+
+    while True:
+        started = time.monotonic()
+        closed = close_auctions(batch_size=batch_size)
+        click.echo(f"Closed {closed} auctions in {time.monotonic() - started:.2f}s")
+
+        if not every:
+            break
+
+        time.sleep(every)
+
+
+@items.command('import')
+@click.argument('source', type=click.Path(exists=True, dir_okay=False, allow_dash=True))
+@click.option('--owner', required=True, help="Nick of the seller the items belong to.")
+@click.option('--format', 'format', type=click.Choice(FORMATS), help="Taken from the file extension by default.")
+@click.option('--batch-size', type=int, help="Rows per INSERT and commit, IMPORT_BATCH_SIZE by default.")
+def import_command(source, owner, format, batch_size):
+    """Import items from a CSV file with a header or a JSON lines file ('-' reads stdin).
+    Columns: name, description, asking_price, start_date, end_date (local time, YYYY-MM-DDTHH:MM)."""
+
+    user = User.query.filter_by(nick=owner).first()
+
+    if user is None:
+        raise click.BadParameter(f"No user {owner}", param_hint='--owner')
+
+    format = format or os.path.splitext(source)[1].lstrip('.').lower()
+
+    if format not in FORMATS:
+        raise click.BadParameter(f"Unknown format of {source}, use --format", param_hint='--format')
+
+    # newline='' as the csv module needs it - quoted fields may hold line breaks
+    if source == '-':
+        stream = io.TextIOWrapper(click.get_binary_stream('stdin'), encoding='utf-8', newline='')
+    else:
+        stream = open(source, encoding='utf-8', newline='')
+
+    started = time.monotonic()
+
+    with stream:
+        result = import_items(stream, format, user.id,
+            batch_size or current_app.config.get('IMPORT_BATCH_SIZE', 1000),
+            current_app.config.get('IMPORT_MAX_ERRORS', 100))
+
+    for error in result.errors:
+        click.echo(f"Line {error['line']}: {error['error']}", err=True)
+
+    click.echo(f"Imported {result.imported} items in {time.monotonic() - started:.2f}s, {result.failed} rows failed")
+
+
+@items.command('export')
+@click.argument('output', type=click.File('w', encoding='utf-8'), default='-')
+@click.option('--format', 'format', type=click.Choice(FORMATS), default='csv', show_default=True)
+@click.option('--start', type=click.DateTime(['%Y-%m-%d']), help="First day the auctions ended on.")
+@click.option('--end', type=click.DateTime(['%Y-%m-%d']), help="Last day the auctions ended on.")
+@click.option('--seller', help="Nick of the owner.")
+@click.option('--status', type=click.Choice(STATUSES), default='closed', show_default=True)
+def export_command(output, format, start, end, seller, status):
+    """Export auction results with owner and winner nicks ('-' writes stdout)."""
+
+    seller_id = None
+
+    if seller:
+        user = User.query.filter_by(nick=seller).first()
+
+        if user is None:
+            raise click.BadParameter(f"No user {seller}", param_hint='--seller')
+
+        seller_id = user.id
+
+    start, end = day_bounds(start and start.date(), end and end.date())
+
+    for chunk in export_results(export_engine(current_app), format, current_app.config.get('EXPORT_CHUNK_SIZE', 1000),
+            start=start, end=end, seller_id=seller_id, status=status):
+        output.write(chunk)
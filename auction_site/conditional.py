@@ -0,0 +1,101 @@
+import hashlib
+from functools import wraps
+from itertools import chain
+from flask import request, make_response, g
+from flask_login import current_user
+from sqlalchemy import event, func, inspect
+
+from .models import Item, User, Counter, database
+from .times import now
+
+
+def item_validator(item_id):
+    # Every UPDATE of the item bumps its version, the owner's nick is shown on the page too
+    row = database.session.query(Item.version, Item.updated_at, User.nick).outerjoin(
+        User, User.id == Item.owner_id
+    ).filter(Item.id == item_id).first()
+
+    if row is None:
+        return None
+
+    return f'item-{item_id}-{row.version}-{row.nick}', row.updated_at
+
+
+def listings_validator():
+    # The version is bumped with every change the listings show - items, bids, deletions, owner nicks.
+    # The next start or end of an auction changes once it passes, and with it the set of active lots.
+    current = now()
+    version = database.session.query(Counter.value).filter(Counter.name == 'listings').as_scalar()
+    next_start = database.session.query(func.min(Item.start_date)).filter(Item.start_date > current).as_scalar()
+    next_end = database.session.query(func.min(Item.end_date)).filter(
+        Item.status == Item.OPEN,
+        Item.end_date > current
+    ).as_scalar()
+
+    version, start, end = database.session.query(version, next_start, next_end).one()
+
+    # No Last-Modified, nothing in the listings has a modification time covering all of that
+    return f'listings-{version}-{start}-{end}', None
+
+
+@event.listens_for(database.session, 'before_flush')
+def bump_listings_version(session, flush_context, instances):
+    # Items and owner nicks changed through the session, from the pages or the admin panel.
+    # Bulk statements (bids, closing, import) bump the version themselves.
+    changed = chain(session.new, session.dirty, session.deleted)
+
+    if any(isinstance(row, Item) or isinstance(row, User) and inspect(row).attrs.nick.history.has_changes() for row in changed) \
+            or any(isinstance(row, User) for row in session.deleted):
+        Counter.bump('listings')
+
+
+def conditional(validator):
+    """Answer If-None-Match/If-Modified-Since with 304 before the handler runs.
+    `validator` gets the view arguments and returns (version tag, last modified) or None.
+    The tag is handed to cache.cached in g.cache_tag, a cached page is never older than its ETag."""
+
+    def decorator(function):
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            validators = validator(**kwargs)
+
+            if validators is None:
+                return function(*args, **kwargs)
+
+            tag, last_modified = validators
+            auth = current_user.get_id() if current_user.is_authenticated else 'anon'
+            etag = hashlib.sha1(f'{tag}:{request.full_path}:{auth}'.encode()).hexdigest()
+
+            if last_modified is not None:
+                last_modified = last_modified.replace(microsecond=0)
+
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains_weak(etag)
+            else:
+                since = request.if_modified_since
+                not_modified = bool(since and last_modified and last_modified <= since.replace(tzinfo=None))
+
+            if not_modified:
+                response = make_response('', 304)
+            else:
+                g.cache_tag = tag
+
+                try:
+                    response = make_response(function(*args, **kwargs))
+                finally:
+                    g.pop('cache_tag', None)
+
+            if response.status_code in (200, 304):
+                response.set_etag(etag, weak=True)
+                # Werkzeug would write the current time for None
+                if last_modified is not None:
+                    response.last_modified = last_modified
+                response.cache_control.no_cache = True
+                response.vary.add('Cookie')
+
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,116 @@
+import os
+import time
+from flask import has_request_context, request, session as http_session
+from flask_sqlalchemy import SQLAlchemy, SignallingSession
+from sqlalchemy import event, exc, orm
+from sqlalchemy.sql.dml import UpdateBase
+
+SQLITE_PRAGMAS = ('journal_mode', 'synchronous', 'busy_timeout', 'mmap_size')
+
+
+def apply_pragmas(engine, pragmas):
+    # Run on every new DBAPI connection, before SQLAlchemy opens a transaction on it
+
+    @event.listens_for(engine, 'connect')
+    def connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+        cursor.close()
+
+
+def fork_safe(engine):
+    # A pooled connection opened before a fork (gunicorn --preload, multiprocessing) belongs to the
+    # parent - the child drops it and opens its own instead of sharing the socket
+
+    @event.listens_for(engine, 'connect')
+    def connect(dbapi_connection, connection_record):
+        connection_record.info['pid'] = os.getpid()
+
+
+    @event.listens_for(engine, 'checkout')
+    def checkout(dbapi_connection, connection_record, connection_proxy):
+        pid = os.getpid()
+
+        if connection_record.info['pid'] != pid:
+            connection_record.connection = connection_proxy.connection = None
+            raise exc.DisconnectionError(
+                f"Connection record belongs to pid {connection_record.info['pid']}, checked out in pid {pid}"
+            )
+
+
+#================================================================
+class RoutingSession(SignallingSession):
+    """Session that reads from the 'replica' bind during GET/HEAD requests.
+    Flushes and UPDATE/INSERT/DELETE statements always go to the primary, and a user who
+    wrote keeps reading from the primary for DATABASE_REPLICA_LAG seconds (read-your-writes)."""
+
+    def __init__(self, db, **options):
+        self.db = db
+        super().__init__(db, **options)
+
+
+    def get_bind(self, mapper=None, clause=None):
+        if self._flushing or isinstance(clause, UpdateBase):
+            self.stick_to_primary()
+        elif self.reads_from_replica():
+            return self.db.get_engine(self.app, bind='replica')
+
+        return super().get_bind(mapper, clause)
+
+
+    def reads_from_replica(self):
+        if 'replica' not in (self.app.config.get('SQLALCHEMY_BINDS') or {}):
+            return False
+
+        if not has_request_context() or request.method not in ('GET', 'HEAD'):
+            return False
+
+        return http_session.get('_primary_until', 0) < time.time()
+
+
+    def stick_to_primary(self):
+        if has_request_context() and 'replica' in (self.app.config.get('SQLALCHEMY_BINDS') or {}):
+            http_session['_primary_until'] = time.time() + self.app.config.get('DATABASE_REPLICA_LAG', 5)
+
+
+#================================================================
+class Database(SQLAlchemy):
+    """SQLAlchemy whose engine takes its pool from the DATABASE_* config and, for SQLite,
+    runs the SQLITE_* pragmas on every connection. Explicit SQLALCHEMY_ENGINE_OPTIONS still win."""
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+
+    def apply_driver_hacks(self, app, sa_url, options):
+        super().apply_driver_hacks(app, sa_url, options)
+
+        if sa_url.drivername.startswith('sqlite'):
+            # Not an engine argument, create_engine() takes it back out
+            options['sqlite_pragmas'] = {
+                name: app.config[f'SQLITE_{name.upper()}']
+                for name in SQLITE_PRAGMAS
+                if app.config.get(f'SQLITE_{name.upper()}') is not None
+            }
+        else:
+            options.setdefault('pool_size', app.config.get('DATABASE_POOL_SIZE', 5))
+            options.setdefault('max_overflow', app.config.get('DATABASE_MAX_OVERFLOW', 10))
+            options.setdefault('pool_timeout', app.config.get('DATABASE_POOL_TIMEOUT', 30))
+            options.setdefault('pool_recycle', app.config.get('DATABASE_POOL_RECYCLE', 1800))
+            options.setdefault('pool_pre_ping', app.config.get('DATABASE_POOL_PRE_PING', True))
+
+
+    def create_engine(self, sa_url, engine_opts):
+        pragmas = engine_opts.pop('sqlite_pragmas', None)
+        engine = super().create_engine(sa_url, engine_opts)
+
+        # SQLite files are not pooled across forks (NullPool), server databases are
+        if sa_url.drivername.startswith('sqlite'):
+            apply_pragmas(engine, pragmas or {})
+        else:
+            fork_safe(engine)
+
+        return engine
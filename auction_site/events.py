@@ -0,0 +1,201 @@
+import json
+import logging
+import os
+import queue
+import time
+from collections import defaultdict
+from threading import Lock, Thread
+
+logger = logging.getLogger(__name__)
+
+
+class LocalSubscription():
+
+    def __init__(self, pubsub, channel, size):
+        self.pubsub = pubsub
+        self.channel = channel
+        self.messages = queue.Queue(maxsize=size)
+
+
+    def put(self, message):
+        # A slow client only needs the latest state, drop the oldest message
+        while True:
+            try:
+                self.messages.put_nowait(message)
+                return
+            except queue.Full:
+                try:
+                    self.messages.get_nowait()
+                except queue.Empty:
+                    pass
+
+
+    def get(self, timeout=None):
+        try:
+            return self.messages.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+    def close(self):
+        self.pubsub.unsubscribe(self)
+
+
+class LocalPubSub():
+    # Fan-out inside one worker process
+
+    def __init__(self, queue_size=16):
+        self.queue_size = queue_size
+        self.subscriptions = defaultdict(set)
+        self.lock = Lock()
+
+
+    def publish(self, channel, message):
+        with self.lock:
+            subscriptions = list(self.subscriptions.get(channel, ()))
+
+        for subscription in subscriptions:
+            subscription.put(message)
+
+
+    def subscribe(self, channel):
+        subscription = LocalSubscription(self, channel, self.queue_size)
+
+        with self.lock:
+            self.subscriptions[channel].add(subscription)
+
+        return subscription
+
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            subscriptions = self.subscriptions.get(subscription.channel)
+
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+
+                if not subscriptions:
+                    del self.subscriptions[subscription.channel]
+
+
+class RedisPubSub():
+    """Fan-out across workers and hosts, any client exposing publish/pubsub like redis.Redis.
+    One pattern subscription per worker process feeds a LocalPubSub, the streams subscribe to that -
+    a held SSE client costs a queue, not a Redis connection."""
+
+    def __init__(self, client, prefix='auction_site:', queue_size=16):
+        self.client = client
+        self.prefix = prefix
+        self.local = LocalPubSub(queue_size)
+        self.listener = None
+        self.listener_pid = None
+        self.closed = False
+        self.lock = Lock()
+
+
+    def publish(self, channel, message):
+        self.client.publish(self.prefix + channel, json.dumps(message, default=str))
+
+
+    def subscribe(self, channel):
+        self.listen()
+        return self.local.subscribe(channel)
+
+
+    def listen(self):
+        # Started by the first subscriber, a listener inherited through fork has no thread left
+        with self.lock:
+            if self.listener is None or self.listener_pid != os.getpid():
+                self.listener = Thread(target=self.run, name='events-listener', daemon=True)
+                self.listener_pid = os.getpid()
+                self.listener.start()
+
+
+    def run(self):
+        while not self.closed:
+            try:
+                pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                pubsub.psubscribe(self.prefix + '*')
+
+                try:
+                    while not self.closed:
+                        message = pubsub.get_message(timeout=1.0)
+
+                        if message is not None and message['type'] == 'pmessage':
+                            self.deliver(message)
+                finally:
+                    pubsub.close()
+            except Exception:
+                logger.exception("Events listener lost the Redis connection, reconnecting")
+                time.sleep(1)
+
+
+    def deliver(self, message):
+        channel = message['channel']
+
+        if isinstance(channel, bytes):
+            channel = channel.decode()
+
+        self.local.publish(channel[len(self.prefix):], json.loads(message['data']))
+
+
+    def close(self):
+        self.closed = True
+
+
+#================================================================
+class Events():
+
+    def __init__(self, app=None):
+        self.backend = LocalPubSub()
+        self.heartbeat = 15
+
+        if app is not None:
+            self.init_app(app)
+
+
+    def init_app(self, app):
+        self.heartbeat = app.config.get('EVENTS_HEARTBEAT', 15)
+
+        if app.config.get('EVENTS_TYPE', 'local') == 'redis':
+            try:
+                import redis
+            except ImportError:
+                raise RuntimeError("EVENTS_TYPE = 'redis' requires the redis package")
+
+            self.backend = RedisPubSub(redis.Redis.from_url(app.config['EVENTS_REDIS_URL']),
+                queue_size=app.config.get('EVENTS_QUEUE_SIZE', 16))
+        else:
+            self.backend = LocalPubSub(app.config.get('EVENTS_QUEUE_SIZE', 16))
+
+        app.extensions['events'] = self
+
+
+    def publish(self, channel, message):
+        self.backend.publish(channel, message)
+
+
+    def subscribe(self, channel):
+        return self.backend.subscribe(channel)
+
+
+    def stream(self, channel):
+        """Server-Sent Events body for one client: pushed messages and heartbeat comments."""
+
+        subscription = self.subscribe(channel)
+
+        try:
+            yield f'retry: {self.heartbeat * 1000}\n\n'
+
+            while True:
+                message = subscription.get(timeout=self.heartbeat)
+
+                if message is None:
+                    yield ': heartbeat\n\n'
+                else:
+                    yield f"event: {message.get('type', 'message')}\ndata: {json.dumps(message, default=str)}\n\n"
+        finally:
+            subscription.close()
+
+
+events = Events()
@@ -0,0 +1,111 @@
+import csv
+import io
+import json
+from datetime import datetime, time, timedelta
+from sqlalchemy import select, and_
+
+from .models import Item, User, database
+from .times import to_utc
+
+FORMATS = ('csv', 'jsonl')
+STATUSES = (Item.CLOSED, Item.OPEN, 'all')
+MIMETYPES = {'csv': 'text/csv', 'jsonl': 'application/x-ndjson'}
+
+Owner = User.__table__.alias('owner')
+Winner = User.__table__.alias('winner')
+
+# Dates are UTC, like in the database
+COLUMNS = (
+    ('id', Item.__table__.c.id),
+    ('name', Item.__table__.c.name),
+    ('status', Item.__table__.c.status),
+    ('start_date', Item.__table__.c.start_date),
+    ('end_date', Item.__table__.c.end_date),
+    ('asking_price', Item.__table__.c.asking_price),
+    ('current_price', Item.__table__.c.current_price),
+    ('owner_id', Item.__table__.c.owner_id),
+    ('owner', Owner.c.nick),
+    ('winner_id', Item.__table__.c.winner_id),
+    ('winner', Winner.c.nick),
+)
+
+
+def day_bounds(start=None, end=None):
+    # Local calendar days, both included, as UTC datetimes - end is exclusive
+    return (
+        to_utc(datetime.combine(start, time())) if start else None,
+        to_utc(datetime.combine(end + timedelta(days=1), time())) if end else None
+    )
+
+
+def results_select(start=None, end=None, seller_id=None, status=Item.CLOSED):
+    """Lots that ended in [start, end) with their owner and winner nicks joined in, by id."""
+
+    item = Item.__table__
+    conditions = list()
+
+    if start:
+        conditions.append(item.c.end_date >= start)
+    if end:
+        conditions.append(item.c.end_date < end)
+    if seller_id:
+        conditions.append(item.c.owner_id == seller_id)
+    if status != 'all':
+        conditions.append(item.c.status == status)
+
+    return select([column.label(name) for name, column in COLUMNS]).select_from(
+        item.outerjoin(Owner, Owner.c.id == item.c.owner_id).outerjoin(Winner, Winner.c.id == item.c.winner_id)
+    ).where(and_(*conditions)).order_by(item.c.id)
+
+
+def stream_rows(engine, statement, chunk_size=1000):
+    """Rows of `statement`, `chunk_size` at a time from a server-side cursor (psycopg2, MySQLdb)
+    or SQLite's own lazy cursor. The connection is the generator's, not the session's."""
+
+    with engine.connect() as connection:
+        result = connection.execution_options(stream_results=True).execute(statement)
+
+        while True:
+            rows = result.fetchmany(chunk_size)
+
+            if not rows:
+                break
+
+            yield rows
+
+
+def csv_chunks(chunks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([name for name, column in COLUMNS])
+
+    for rows in chunks:
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def jsonl_chunks(chunks):
+    names = [name for name, column in COLUMNS]
+
+    for rows in chunks:
+        yield ''.join(json.dumps(dict(zip(names, row)), default=datetime.isoformat) + '\n' for row in rows)
+
+
+def export_results(engine, format, chunk_size=1000, **filters):
+    """Text chunks of the export, nothing is read before the first one is requested."""
+
+    chunks = stream_rows(engine, results_select(**filters), chunk_size)
+    return csv_chunks(chunks) if format == 'csv' else jsonl_chunks(chunks)
+
+
+def export_engine(app):
+    # Exports only read, a replica takes them off the primary
+    if 'replica' in (app.config.get('SQLALCHEMY_BINDS') or {}):
+        return database.get_engine(app, bind='replica')
+
+    return database.get_engine(app)
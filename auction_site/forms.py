@@ -1,7 +1,26 @@
 from flask_wtf import FlaskForm
-from wtforms import StringField, PasswordField, FloatField, TextAreaField, DateField
+from wtforms import StringField, PasswordField, FloatField, TextAreaField
+from wtforms.fields.html5 import DateTimeLocalField
 from wtforms.validators import InputRequired, Length
-from datetime import date
+from datetime import timedelta
+
+from .times import now, to_local
+
+DATETIME_FORMAT = '%Y-%m-%dT%H:%M'
+
+
+def default_start():
+    return to_local(now()).replace(second=0, microsecond=0)
+
+
+def default_end():
+    return default_start() + timedelta(days=1)
+
+
+# Times in UTC - an auction must end after it starts (it would never be open otherwise) and not start before today
+def item_dates_valid(start_date, end_date):
+    return start_date < end_date and to_local(start_date).date() >= to_local(now()).date()
+
 
 class LoginForm(FlaskForm):
     nick = StringField('Nick', validators=[InputRequired()])
@@ -15,6 +34,13 @@ class RegisterForm(FlaskForm):
     last_name = StringField('Nazwisko', validators=[Length(max=256)])
 
 
+class SearchForm(FlaskForm):
+    class Meta:
+        csrf = False
+
+    q = StringField('Szukaj', validators=[InputRequired(), Length(max=256)])
+
+
 class NewPriceForm(FlaskForm):
     new_price = FloatField('Nowa cena')
 
@@ -29,13 +55,13 @@ class AddItemForm(FlaskForm):
     name = StringField("Nazwa", validators=[InputRequired(), Length(max=256)])
     description = TextAreaField("Opis", validators=[Length(max=2048)])
     asking_price = FloatField("Cena wywoławcza", validators=[InputRequired()], default=0.0)
-    start_date = DateField("Data rozpoczęcia", validators=[InputRequired()], default=date.today())
-    end_date = DateField("Data zakończenia", validators=[InputRequired()], default=date.today())
+    start_date = DateTimeLocalField("Data rozpoczęcia", validators=[InputRequired()], format=DATETIME_FORMAT, default=default_start)
+    end_date = DateTimeLocalField("Data zakończenia", validators=[InputRequired()], format=DATETIME_FORMAT, default=default_end)
 
 
 class EditItemForm(FlaskForm):
     name = StringField("Nazwa", validators=[Length(max=256)])
     description = TextAreaField("Opis", validators=[Length(max=2048)])
     asking_price = FloatField("Cena wywoławcza", default=0.0)
-    start_date = DateField("Data rozpoczęcia", default=date.today())
-    end_date = DateField("Data zakończenia", default=date.today())
\ No newline at end of file
+    start_date = DateTimeLocalField("Data rozpoczęcia", format=DATETIME_FORMAT, default=default_start)
+    end_date = DateTimeLocalField("Data zakończenia", format=DATETIME_FORMAT, default=default_end)
\ No newline at end of file
@@ -0,0 +1,47 @@
+from markupsafe import Markup
+
+from .cache import MemoryBackend, NullBackend
+
+
+class Fragments():
+    """Rendered pieces of templates, kept in the worker's memory - a card is cheaper to render
+    than to fetch from redis. Keys carry the row version, a changed item gets a new entry.
+
+        {% call fragment('item_card', item.id, item.version, item.updated_at) %} ... {% endcall %}
+    """
+
+    def __init__(self, app=None):
+        self.backend = NullBackend()
+
+        if app is not None:
+            self.init_app(app)
+
+
+    def init_app(self, app):
+        size = app.config.get('FRAGMENT_CACHE_SIZE', 4096)
+
+        if size:
+            self.backend = MemoryBackend(size, app.config.get('FRAGMENT_CACHE_TTL', 600))
+        else:
+            self.backend = NullBackend()
+
+        app.jinja_env.globals['fragment'] = self.fragment
+        app.extensions['fragments'] = self
+
+
+    def fragment(self, *key, caller):
+        key = ':'.join(map(str, key))
+        markup = self.backend.get(key)
+
+        if markup is None:
+            markup = str(caller())
+            self.backend.set(key, markup)
+
+        return Markup(markup)
+
+
+    def clear(self):
+        self.backend.clear()
+
+
+fragments = Fragments()
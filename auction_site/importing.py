@@ -0,0 +1,179 @@
+import csv
+import io
+import json
+import math
+from datetime import datetime
+from functools import lru_cache
+from itertools import islice
+
+from .models import Item, Counter, database
+from .forms import DATETIME_FORMAT, item_dates_valid
+from .times import now, to_utc
+
+FORMATS = ('csv', 'jsonl')
+# Content types of /items/import, no form can be sent as one of them across sites
+IMPORT_MIMETYPES = {
+    'text/csv': 'csv',
+    'application/x-ndjson': 'jsonl',
+    'application/jsonl': 'jsonl',
+}
+COLUMNS = ('name', 'description', 'asking_price', 'current_price', 'start_date', 'end_date', 'owner_id', 'status', 'version', 'updated_at')
+
+
+class ImportResult():
+
+    def __init__(self, max_errors):
+        self.imported = 0
+        self.failed = 0
+        self.errors = list()
+        self.max_errors = max_errors
+
+
+    def error(self, line, message):
+        # Only the first errors are kept, a broken file must not fill the memory
+        self.failed += 1
+
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'line': line, 'error': message})
+
+
+    def as_dict(self):
+        return {'imported': self.imported, 'failed': self.failed, 'errors': self.errors}
+
+
+def read_rows(stream, format):
+    """Yield (line, row) from a text stream of CSV with a header or of JSON lines, one row at a time."""
+
+    if format == 'csv':
+        reader = csv.DictReader(stream)
+
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        for line, text in enumerate(stream, 1):
+            if not text.strip():
+                continue
+
+            try:
+                row = json.loads(text)
+            except ValueError as error:
+                yield line, f'Invalid JSON: {error}'
+                continue
+
+            yield line, row if isinstance(row, dict) else 'Expected a JSON object'
+
+
+def parse_date(value):
+    # Local time like the form fields, seconds are allowed
+    if isinstance(value, str):
+        for parse in (lambda text: datetime.strptime(text, DATETIME_FORMAT), datetime.fromisoformat):
+            try:
+                return to_utc(parse(value.strip()).replace(tzinfo=None))
+            except ValueError:
+                pass
+
+    raise ValueError(f'Invalid date {value!r}, expected YYYY-MM-DDTHH:MM')
+
+
+def parse_row(row, owner_id, current, parse_date=parse_date, dates_valid=item_dates_valid):
+    """The row as item table values, the rules of AddItemForm and ItemAdd.post. Raises ValueError."""
+
+    name = str(row.get('name') or '').strip()
+    description = str(row.get('description') or '')
+
+    if not name:
+        raise ValueError('Missing name')
+    if len(name) > 256:
+        raise ValueError('Name longer than 256 characters')
+    if len(description) > 2048:
+        raise ValueError('Description longer than 2048 characters')
+
+    try:
+        asking_price = float(row.get('asking_price'))
+    except (TypeError, ValueError):
+        asking_price = math.nan
+
+    if not math.isfinite(asking_price):
+        raise ValueError(f"Invalid asking_price {row.get('asking_price')!r}")
+
+    start_date = parse_date(row.get('start_date'))
+    end_date = parse_date(row.get('end_date'))
+
+    if not dates_valid(start_date, end_date):
+        raise ValueError('Auction does not end after it starts or starts before today')
+
+    return {
+        'name': name,
+        'description': description,
+        'asking_price': asking_price,
+        'current_price': asking_price,
+        'start_date': start_date,
+        'end_date': end_date,
+        'owner_id': owner_id,
+        'status': Item.OPEN,
+        'version': 1,
+        'updated_at': current,
+    }
+
+
+def copy_batch(batch):
+    # Postgres loads a CSV buffer with COPY far faster than an executemany INSERT
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    for values in batch:
+        writer.writerow([values[column] for column in COLUMNS])
+
+    buffer.seek(0)
+    cursor = database.session.connection().connection.cursor()
+    cursor.copy_expert(f'COPY item ({", ".join(COLUMNS)}) FROM STDIN WITH (FORMAT csv)', buffer)
+    cursor.close()
+
+
+def insert_batch(batch):
+    if database.engine.dialect.name == 'postgresql':
+        copy_batch(batch)
+    else:
+        database.session.execute(Item.__table__.insert(), batch)
+
+    Counter.bump('listings')
+    database.session.commit()
+
+
+def import_items(stream, format, owner_id, batch_size=1000, max_errors=100):
+    """Insert the items of a CSV/JSONL stream owned by `owner_id`, `batch_size` rows per statement
+    and commit. Invalid rows are reported in the result and skipped, the rest is imported."""
+
+    result = ImportResult(max_errors)
+    current = now()
+    rows = read_rows(stream, format)
+
+    # Lots of a file mostly share a few dates, the time zone conversion is the costly part of a row.
+    # Only strings are memoized, a list or an object from JSON is not hashable and is rejected as usual.
+    cached_dates = lru_cache(maxsize=4096)(parse_date)
+    dates = lambda value: cached_dates(value) if isinstance(value, str) else parse_date(value)
+    dates_valid = lru_cache(maxsize=4096)(item_dates_valid)
+
+    while True:
+        chunk = list(islice(rows, batch_size))
+
+        if not chunk:
+            break
+
+        batch = list()
+
+        for line, row in chunk:
+            if isinstance(row, str):
+                result.error(line, row)
+                continue
+
+            try:
+                batch.append(parse_row(row, owner_id, current, dates, dates_valid))
+            except (TypeError, ValueError) as error:
+                result.error(line, str(error))
+
+        if batch:
+            insert_batch(batch)
+            result.imported += len(batch)
+
+    return result
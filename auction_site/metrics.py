@@ -0,0 +1,184 @@
+import logging
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from threading import Lock
+from flask import g, request, has_request_context
+from jinja2 import Template
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the buckets, +Inf is added by the exposition
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERIES_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+
+HISTOGRAMS = {
+    'auction_site_request_seconds': ("Request latency until the response is returned", SECONDS_BUCKETS),
+    'auction_site_sql_seconds': ("Time spent executing SQL per request", SECONDS_BUCKETS),
+    'auction_site_render_seconds': ("Time spent rendering templates per request", SECONDS_BUCKETS),
+    'auction_site_sql_queries': ("SQL statements executed per request", QUERIES_BUCKETS),
+}
+
+
+class Histogram():
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class RequestStats():
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql = 0.0
+        self.render = 0.0
+        self.statements = Counter()
+
+
+class TimedTemplate(Template):
+    # Jinja has no render hook without blinker, the top level render includes extends/include
+
+    def render(self, *args, **kwargs):
+        stats = current_stats()
+
+        if stats is None:
+            return super().render(*args, **kwargs)
+
+        started = time.perf_counter()
+
+        try:
+            return super().render(*args, **kwargs)
+        finally:
+            stats.render += time.perf_counter() - started
+
+
+def current_stats():
+    return g.get('_request_stats') if has_request_context() else None
+
+#================================================================
+# Every engine, the replica bind included - statements outside of a request are not counted
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if current_stats() is not None:
+        conn.info.setdefault('_query_started', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = current_stats()
+    started = conn.info.get('_query_started')
+
+    if stats is not None and started:
+        stats.sql += time.perf_counter() - started.pop()
+        stats.queries += 1
+        stats.statements[statement] += 1
+
+#================================================================
+class Metrics():
+    """Per endpoint histograms of latency, SQL time, render time and query count, kept per worker.
+    Requests over METRICS_QUERY_BUDGET statements or METRICS_LATENCY_BUDGET ms are logged
+    with their most repeated statement - usually an N+1 loop."""
+
+    def __init__(self, app=None):
+        self.histograms = defaultdict(dict)
+        self.lock = Lock()
+        self.query_budget = 0
+        self.latency_budget = 0
+
+        if app is not None:
+            self.init_app(app)
+
+
+    def init_app(self, app):
+        self.query_budget = app.config.get('METRICS_QUERY_BUDGET', 0)
+        self.latency_budget = app.config.get('METRICS_LATENCY_BUDGET', 0)
+        app.extensions['metrics'] = self
+
+        if app.config.get('METRICS_ENABLED', True):
+            app.jinja_env.template_class = TimedTemplate
+            app.before_request(self.start)
+            app.after_request(self.finish)
+
+
+    def start(self):
+        g._request_stats = RequestStats()
+
+
+    def finish(self, response):
+        stats = g.pop('_request_stats', None)
+
+        if stats is None:
+            return response
+
+        latency = time.perf_counter() - stats.started
+        endpoint = request.endpoint or 'unmatched'
+
+        self.observe(endpoint, {
+            'auction_site_request_seconds': latency,
+            'auction_site_sql_seconds': stats.sql,
+            'auction_site_render_seconds': stats.render,
+            'auction_site_sql_queries': stats.queries,
+        })
+
+        if (self.query_budget and stats.queries > self.query_budget) or (self.latency_budget and latency * 1000 > self.latency_budget):
+            statement, repeats = stats.statements.most_common(1)[0] if stats.statements else ('', 0)
+            logger.warning(
+                "%s %s over budget: %d queries (%.1f ms SQL), %.1f ms render, %.1f ms total; executed %d times: %s",
+                request.method, request.path, stats.queries, stats.sql * 1000, stats.render * 1000, latency * 1000,
+                repeats, ' '.join(statement.split())
+            )
+
+        return response
+
+
+    def observe(self, endpoint, values):
+        with self.lock:
+            for name, value in values.items():
+                histogram = self.histograms[name].get(endpoint)
+
+                if histogram is None:
+                    histogram = self.histograms[name][endpoint] = Histogram(HISTOGRAMS[name][1])
+
+                histogram.observe(value)
+
+
+    def reset(self):
+        with self.lock:
+            self.histograms.clear()
+
+
+    def exposition(self):
+        """Prometheus text format (version 0.0.4)."""
+
+        lines = list()
+
+        with self.lock:
+            for name, (description, buckets) in HISTOGRAMS.items():
+                lines.append(f'# HELP {name} {description}')
+                lines.append(f'# TYPE {name} histogram')
+
+                for endpoint, histogram in sorted(self.histograms.get(name, {}).items()):
+                    cumulative = 0
+
+                    for bound, count in zip(buckets + ('+Inf',), histogram.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{{endpoint="{endpoint}",le="{bound}"}} {cumulative}')
+
+                    lines.append(f'{name}_sum{{endpoint="{endpoint}"}} {histogram.sum}')
+                    lines.append(f'{name}_count{{endpoint="{endpoint}"}} {cumulative}')
+
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
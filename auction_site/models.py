@@ -1,34 +1,76 @@
-from flask_sqlalchemy import SQLAlchemy
+from datetime import datetime
+from flask import current_app
 from flask_restx import fields
 from flask_login import UserMixin
+from sqlalchemy.orm import joinedload, selectinload
 
-database = SQLAlchemy()
+from .engine import Database
+
+database = Database()
+
+USER_LOADERS = {
+    'joined': joinedload,
+    'selectin': selectinload,
+}
 
 #================================================================
 class Item(database.Model):
+    OPEN = 'open'
+    CLOSED = 'closed'
+
     FIELDS = {
         'name': fields.String(required=True),
         'description': fields.String(),
-        'start_date': fields.Date(required=True),
-        'end_date': fields.Date(required=True),
+        'start_date': fields.DateTime(required=True),
+        'end_date': fields.DateTime(required=True),
         'asking_price': fields.Float(default=0.00),
     }
 
+    __table_args__ = (
+        database.Index('ix_item_start_date_end_date', 'start_date', 'end_date'),
+        database.Index('ix_item_status_end_date', 'status', 'end_date'),
+    )
+
     id = database.Column(database.Integer, primary_key=True)
     name = database.Column(database.String(256), nullable=False)
     description = database.Column(database.String(2048))
-    start_date = database.Column(database.Date(), nullable=False)
-    end_date = database.Column(database.Date(), nullable=False)
+    start_date = database.Column(database.DateTime(), nullable=False)
+    end_date = database.Column(database.DateTime(), nullable=False, index=True)
     asking_price = database.Column(database.Float, default=0.00)
     current_price = database.Column(database.Float)
+    status = database.Column(database.String(16), nullable=False, default=OPEN, server_default=OPEN)
 
-    owner_id = database.Column(database.Integer, database.ForeignKey('user.id'))
+    owner_id = database.Column(database.Integer, database.ForeignKey('user.id'), index=True)
     winner_id = database.Column(database.Integer)
 
+    # Bumped by every UPDATE of the row, including bulk ones like bids
+    version = database.Column(database.Integer, nullable=False, default=1, server_default='1',
+        onupdate=database.literal_column('version + 1'))
+    updated_at = database.Column(database.DateTime(), default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+
+    owner = database.relationship('User', back_populates='user_items')
+    winner = database.relationship('User', primaryjoin='foreign(Item.winner_id) == User.id', viewonly=True)
+    bids = database.relationship('Bid', back_populates='item', lazy='dynamic', passive_deletes=True)
+
     def __str__(self):
         return f"Item: {self.name} ({self.current_price}zł)"
 
 
+# Prices the way bidding reads them - never NULL, so they can be sorted on and carry a keyset cursor
+CURRENT_PRICE = database.func.coalesce(Item.current_price, Item.asking_price, database.literal_column('0'))
+ASKING_PRICE = database.func.coalesce(Item.asking_price, database.literal_column('0'))
+
+# Active lots sorted or filtered by price are read in index order
+database.Index('ix_item_status_current_price', Item.status, CURRENT_PRICE, Item.id)
+database.Index('ix_item_status_asking_price', Item.status, ASKING_PRICE, Item.id)
+
+
+def with_users(query):
+    # Owner and winner are loaded together with the items, strategy comes from ITEM_USERS_LOADING
+    loader = USER_LOADERS[current_app.config.get('ITEM_USERS_LOADING', 'joined')]
+    return query.options(loader(Item.owner), loader(Item.winner))
+
+
 #================================================================
 class User(database.Model, UserMixin):
     FIELDS = {
@@ -39,7 +81,7 @@ class User(database.Model, UserMixin):
     }
 
     id = database.Column(database.Integer, primary_key=True)
-    nick = database.Column(database.String(256), nullable=False)
+    nick = database.Column(database.String(256), nullable=False, unique=True, index=True)
     first_name = database.Column(database.String(256))
     last_name = database.Column(database.String(256))
     active = database.Column(database.Boolean)
@@ -47,7 +89,58 @@ class User(database.Model, UserMixin):
     register_date = database.Column(database.Date(), nullable=False)
     password = database.Column(database.String(256), nullable=False)
 
-    user_items = database.relationship('Item', backref='user')
+    user_items = database.relationship('Item', back_populates='owner')
+
+    def __str__(self):
+        return f"User: {self.nick} ({self.first_name} {self.last_name})"
+
+    @classmethod
+    def nick_exists(cls, nick):
+        return database.session.query(cls.query.filter(cls.nick == nick).exists()).scalar()
+
+
+class UserPresence(database.Model):
+    # Logged in flag and last request of a user, written in batches by the presence buffer
+    user_id = database.Column(database.Integer, database.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True)
+    active = database.Column(database.Boolean, nullable=False, default=False)
+    last_seen = database.Column(database.DateTime(), nullable=False)
 
     def __str__(self):
-        return f"User: {self.nick} ({self.first_name} {self.last_name})"
\ No newline at end of file
+        return f"Presence: user {self.user_id} ({'active' if self.active else 'inactive'})"
+
+
+#================================================================
+class Bid(database.Model):
+    id = database.Column(database.Integer, primary_key=True)
+    item_id = database.Column(database.Integer, database.ForeignKey('item.id', ondelete='CASCADE'), nullable=False)
+    user_id = database.Column(database.Integer, database.ForeignKey('user.id', ondelete='SET NULL'))
+    amount = database.Column(database.Float, nullable=False)
+    timestamp = database.Column(database.DateTime(), nullable=False, default=datetime.utcnow)
+
+    item = database.relationship('Item', back_populates='bids')
+    user = database.relationship('User')
+
+    def __str__(self):
+        return f"Bid: {self.amount}zł on item {self.item_id}"
+
+
+# Leader and top bids of an item are read straight from this index
+database.Index('ix_bid_item_id_amount', Bid.item_id, Bid.amount.desc())
+
+
+#================================================================
+class Counter(database.Model):
+    # Versions of data that has no row of its own to carry one, like the listings as a whole
+    name = database.Column(database.String(64), primary_key=True)
+    value = database.Column(database.Integer, nullable=False, default=0)
+
+    def __str__(self):
+        return f"Counter: {self.name} ({self.value})"
+
+    @classmethod
+    def bump(cls, name):
+        # One UPDATE in the caller's transaction, the row is created by the migration or the first bump
+        table = cls.__table__
+
+        if not database.session.execute(table.update().where(table.c.name == name).values(value=table.c.value + 1)).rowcount:
+            database.session.execute(table.insert().values(name=name, value=1))
@@ -0,0 +1,121 @@
+import base64
+import binascii
+import json
+from flask import current_app, request, url_for
+from sqlalchemy import and_, or_
+
+
+def encode_cursor(values):
+    values = [v.isoformat() if hasattr(v, 'isoformat') else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, order):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (binascii.Error, ValueError):
+        return None
+
+    if not isinstance(values, list) or len(values) != len(order):
+        return None
+
+    decoded = list()
+    for value, (column, descending) in zip(values, order):
+        python_type = column.type.python_type
+
+        try:
+            if hasattr(python_type, 'fromisoformat'):
+                decoded.append(python_type.fromisoformat(value))
+            else:
+                decoded.append(python_type(value))
+        except (TypeError, ValueError):
+            return None
+
+    return decoded
+
+
+def page_size():
+    size = request.args.get('size', current_app.config['PAGE_SIZE'], type=int)
+    return max(1, min(size, current_app.config['MAX_PAGE_SIZE']))
+
+
+def keyset_filter(order, values, reverse=False):
+    # (a, b) > (x, y) written out as a > x OR (a = x AND b > y), per column direction,
+    # and a >= x on top so the database can seek the index instead of scanning from its start
+    clauses = list()
+
+    for i, (column, descending) in enumerate(order):
+        later = column < values[i] if descending != reverse else column > values[i]
+        equal = [c == v for (c, _), v in zip(order[:i], values[:i])]
+        clauses.append(and_(*equal, later))
+
+    first, descending = order[0]
+    bound = first <= values[0] if descending != reverse else first >= values[0]
+    return and_(bound, or_(*clauses))
+
+
+#================================================================
+class Page():
+
+    def __init__(self, items, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+
+    def url(self, **cursor):
+        args = {k: v for k, v in request.args.items() if k not in ('after', 'before')}
+        args.update(cursor)
+        return url_for(request.endpoint, **request.view_args, **args)
+
+
+    @property
+    def next_url(self):
+        return self.url(after=self.next_cursor) if self.next_cursor else None
+
+
+    @property
+    def prev_url(self):
+        return self.url(before=self.prev_cursor) if self.prev_cursor else None
+
+
+def paginate(query, order, key=None, size=None):
+    """Fetch one page of `query` ordered by `order` - a list of (column, descending) pairs
+    ending with a unique column. The cursor comes from the `after`/`before` request args."""
+
+    if key is None:
+        key = lambda row: [getattr(row, column.key) for column, _ in order]
+
+    size = size or page_size()
+    after = request.args.get('after')
+    before = request.args.get('before')
+    reverse = bool(before) and not after
+    cursor = decode_cursor(before if reverse else after, order) if (before or after) else None
+    reverse = reverse and cursor is not None
+
+    if cursor:
+        query = query.filter(keyset_filter(order, cursor, reverse))
+
+    query = query.order_by(*[
+        column.desc() if descending != reverse else column.asc()
+        for column, descending in order
+    ])
+
+    rows = query.limit(size + 1).all()
+    more = len(rows) > size
+    rows = rows[:size]
+
+    if reverse:
+        rows.reverse()
+
+    if not rows:
+        return Page(rows)
+
+    has_next = True if reverse else more
+    has_prev = more if reverse else cursor is not None
+
+    return Page(
+        rows,
+        next_cursor = encode_cursor(key(rows[-1])) if has_next else None,
+        prev_cursor = encode_cursor(key(rows[0])) if has_prev else None
+    )
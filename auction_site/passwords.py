@@ -0,0 +1,126 @@
+import hashlib
+import hmac
+import logging
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from threading import Lock
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash, gen_salt
+
+logger = logging.getLogger(__name__)
+
+# Hashes are stored as '<method>$<salt>$<hex digest>', the method carries its cost:
+# 'pbkdf2:sha256:<iterations>' (werkzeug) or 'scrypt:<n>:<r>:<p>' (same layout as werkzeug 3)
+DEFAULT_METHOD = 'pbkdf2:sha256:260000'
+
+_executor = None
+_executor_pid = None
+_executor_lock = Lock()
+_dummy_hashes = dict()
+
+
+def scrypt_hash(password, salt, n, r, p):
+    return hashlib.scrypt(password.encode(), salt=salt.encode(), n=n, r=r, p=p, maxmem=132 * n * r * p).hex()
+
+
+def hash_password(password, method=None, salt_length=None):
+    # Called without method/salt_length only inside the app context
+    method = method or current_app.config.get('PASSWORD_METHOD', DEFAULT_METHOD)
+    salt_length = salt_length or current_app.config.get('PASSWORD_SALT_LENGTH', 16)
+
+    if method.startswith('scrypt:'):
+        n, r, p = map(int, method.split(':')[1:])
+        salt = gen_salt(salt_length)
+        return f'{method}${salt}${scrypt_hash(password, salt, n, r, p)}'
+
+    return generate_password_hash(password, method, salt_length)
+
+
+def verify_password(stored, password):
+    if stored.startswith('scrypt:'):
+        try:
+            method, salt, digest = stored.split('$', 2)
+            n, r, p = map(int, method.split(':')[1:])
+        except ValueError:
+            return False
+
+        return hmac.compare_digest(scrypt_hash(password, salt, n, r, p), digest)
+
+    # pbkdf2 and the old single round 'sha256' hashes
+    return check_password_hash(stored, password)
+
+
+def needs_rehash(stored):
+    return stored.split('$', 1)[0] != current_app.config.get('PASSWORD_METHOD', DEFAULT_METHOD)
+
+
+def dummy_hash():
+    # Verified when the nick is unknown, so a miss takes as long as a wrong password
+    method = current_app.config.get('PASSWORD_METHOD', DEFAULT_METHOD)
+
+    if method not in _dummy_hashes:
+        _dummy_hashes[method] = hash_password(gen_salt(16), method, 16)
+
+    return _dummy_hashes[method]
+
+
+def executor():
+    # One pool per process, a pool inherited through fork has no threads left
+    global _executor, _executor_pid
+
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(current_app.config.get('PASSWORD_WORKERS', 4), thread_name_prefix='passwords')
+            _executor_pid = os.getpid()
+
+        return _executor
+
+
+def in_pool(function, *args):
+    """Run a hash off the request's thread, at most PASSWORD_VERIFY_TIMEOUT seconds.
+    Under gevent workers the hub's native thread pool is used, other greenlets keep running."""
+
+    timeout = current_app.config.get('PASSWORD_VERIFY_TIMEOUT', 5)
+
+    if 'gevent.monkey' in sys.modules and sys.modules['gevent.monkey'].is_module_patched('threading'):
+        import gevent
+
+        try:
+            return gevent.get_hub().threadpool.spawn(function, *args).get(timeout=timeout)
+        except gevent.Timeout:
+            raise TimeoutError()
+
+    return executor().submit(function, *args).result(timeout=timeout)
+
+
+def new_password_hash(password):
+    """A hash of the configured method for a new or changed password, computed in the pool.
+    Raises TimeoutError like in_pool."""
+
+    return in_pool(hash_password, password,
+        current_app.config.get('PASSWORD_METHOD', DEFAULT_METHOD), current_app.config.get('PASSWORD_SALT_LENGTH', 16))
+
+
+def check_user_password(user, password):
+    """True when `password` is the password of `user` (None for an unknown nick).
+    An outdated hash is replaced with one of the configured method - the caller commits."""
+
+    stored = user.password if user is not None else dummy_hash()
+
+    try:
+        valid = in_pool(verify_password, stored, password)
+    except TimeoutError:
+        logger.warning("Password verification timed out")
+        return False
+
+    if not valid or user is None:
+        return False
+
+    if needs_rehash(stored):
+        try:
+            user.password = new_password_hash(password)
+        except TimeoutError:
+            logger.warning("Password rehash timed out, left for the next login")
+
+    return True
@@ -0,0 +1,151 @@
+import logging
+import time
+from threading import Lock
+from sqlalchemy import and_, bindparam
+from sqlalchemy.exc import IntegrityError
+
+from .models import User, UserPresence, database
+from .times import now
+
+logger = logging.getLogger(__name__)
+
+# Intervals after which a scheduled flush that never ran no longer blocks the next one
+STALE_INTERVALS = 3
+
+
+class Presence():
+    """Write-behind buffer for logins, logouts and last seen times.
+    Marks only touch memory, flush() writes them to user_presence in two executemany statements."""
+
+    def __init__(self, app=None):
+        self.app = None
+        self.interval = 10
+        self.pending = dict()
+        self.flushed = time.monotonic()
+        self.scheduled = None
+        self.lock = Lock()
+        self.flush_lock = Lock()
+
+        if app is not None:
+            self.init_app(app)
+
+
+    def init_app(self, app):
+        self.app = app
+        self.interval = app.config.get('PRESENCE_FLUSH_INTERVAL', 10)
+        app.after_request(self.schedule)
+        app.extensions['presence'] = self
+
+
+    def mark(self, user_id, active):
+        with self.lock:
+            self.pending[user_id] = (active, now())
+
+
+    def seen(self, user_id):
+        # Any request of a logged in user
+        self.mark(user_id, True)
+
+
+    @property
+    def flushing(self):
+        # A response that is never closed never runs its flush, after a few intervals it stops counting
+        return self.scheduled is not None and time.monotonic() - self.scheduled < STALE_INTERVALS * self.interval
+
+
+    def due(self):
+        return bool(self.pending) and not self.flushing and time.monotonic() - self.flushed >= self.interval
+
+
+    def schedule(self, response):
+        # after_request hook - the flush runs once the response has been sent, not while the user waits.
+        # Streams (SSE) close only when the client leaves, they never carry the flush.
+        if self.due() and not response.is_streamed:
+            self.scheduled = time.monotonic()
+            response.call_on_close(self.flush_in_background)
+
+        return response
+
+
+    def flush_in_background(self):
+        try:
+            with self.app.app_context():
+                self.flush()
+        except Exception:
+            logger.exception("Presence flush failed")
+        finally:
+            self.scheduled = None
+
+
+    def flush(self):
+        """Write the buffered marks, returns how many users were written.
+        A flush already running elsewhere wins, this one returns 0 and leaves the marks buffered."""
+
+        if not self.flush_lock.acquire(blocking=False):
+            return 0
+
+        try:
+            return self.write()
+        finally:
+            self.flush_lock.release()
+
+
+    def write(self):
+        with self.lock:
+            pending, self.pending = self.pending, dict()
+            self.flushed = time.monotonic()
+
+        if not pending:
+            return 0
+
+        try:
+            # Users deleted in the meantime are skipped, the rest is an update or an insert
+            rows = database.session.query(User.id, UserPresence.user_id).outerjoin(
+                UserPresence, UserPresence.user_id == User.id
+            ).filter(User.id.in_(list(pending))).all()
+
+            table = UserPresence.__table__
+            updates = [
+                {'b_user_id': user_id, 'b_active': pending[user_id][0], 'b_last_seen': pending[user_id][1]}
+                for user_id, presence_id in rows if presence_id is not None
+            ]
+            inserts = [
+                {'user_id': user_id, 'active': pending[user_id][0], 'last_seen': pending[user_id][1]}
+                for user_id, presence_id in rows if presence_id is None
+            ]
+
+            # A mark buffered by another worker before a newer one already written is dropped
+            if updates:
+                database.session.execute(table.update().where(and_(
+                    table.c.user_id == bindparam('b_user_id'),
+                    table.c.last_seen <= bindparam('b_last_seen')
+                )).values(
+                    active = bindparam('b_active'),
+                    last_seen = bindparam('b_last_seen')
+                ), updates)
+
+            if inserts:
+                database.session.execute(table.insert(), inserts)
+
+            database.session.commit()
+        except IntegrityError:
+            # Another worker inserted one of the rows first, the next flush updates it
+            self.requeue(pending)
+            logger.info("Presence rows inserted concurrently, flush postponed")
+            return 0
+        except Exception:
+            self.requeue(pending)
+            raise
+
+        return len(rows)
+
+
+    def requeue(self, pending):
+        database.session.rollback()
+
+        # Marks made since are newer, keep those
+        with self.lock:
+            self.pending = {**pending, **self.pending}
+
+
+presence = Presence()
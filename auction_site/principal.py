@@ -0,0 +1,104 @@
+from itertools import chain
+from flask import current_app
+from flask_login import UserMixin, current_user
+from sqlalchemy import event
+
+from .models import User, database
+from .cache import cache
+
+
+class UserPrincipal(UserMixin):
+    """The logged in user as the session sees it - id, nick and admin come from the cache,
+    the User row is loaded only when a handler reads anything else."""
+
+    def __init__(self, id, nick, admin):
+        self.id = id
+        self.nick = nick
+        self.admin = admin
+        self._record = None
+
+
+    @property
+    def record(self):
+        if self._record is None:
+            self._record = User.query.get(self.id)
+
+            # Deleted in another worker, the next request finds no user and logs out
+            if self._record is None:
+                cache.invalidate(f'user:{self.id}')
+
+        return self._record
+
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        record = self.record
+
+        # A deleted user reads as None until the next request logs them out, other misses are bugs
+        if record is None:
+            return None
+
+        return getattr(record, name)
+
+
+def principal_ttl(config):
+    # Only a shared cache sees invalidations from other workers, a private one must expire quickly
+    if cache.backend.shared:
+        return config.get('USER_CACHE_TTL', 60)
+
+    return min(config.get('USER_CACHE_TTL', 60), config.get('USER_CACHE_LOCAL_TTL', 3))
+
+
+def load_principal(user_id):
+    key = cache.key(f'user:{user_id}', 'principal')
+    cached = cache.get(key)
+
+    if cached is None:
+        user = User.query.get(user_id)
+
+        if user is None:
+            return None
+
+        cached = (user.id, user.nick, user.admin)
+        ttl = principal_ttl(current_app.config)
+
+        # 0 turns the principal cache off
+        if ttl > 0:
+            cache.set(key, cached, ttl)
+
+    return UserPrincipal(*cached)
+
+
+def user_summary():
+    # id/nick/admin of the logged in user for the templates, None for guests
+    if not current_user.is_authenticated:
+        return None
+
+    return {
+        'id': current_user.id,
+        'nick': current_user.nick,
+        'admin': current_user.admin
+    }
+
+#================================================================
+# Any committed change to a User row, from the pages or the admin panel, drops its cached principal
+
+@event.listens_for(database.session, 'after_flush')
+def collect_changed_users(session, flush_context):
+    changed = session.info.setdefault('changed_users', set())
+    changed.update(user.id for user in chain(session.dirty, session.deleted) if isinstance(user, User))
+
+
+@event.listens_for(database.session, 'after_commit')
+def invalidate_changed_users(session):
+    changed = session.info.pop('changed_users', ())
+
+    if changed:
+        cache.invalidate(*[f'user:{user_id}' for user_id in changed])
+
+
+@event.listens_for(database.session, 'after_rollback')
+def forget_changed_users(session):
+    session.info.pop('changed_users', None)
@@ -0,0 +1,126 @@
+from datetime import datetime, time, timedelta
+from sqlalchemy import func, case, and_
+
+from .models import Item, User, database, with_users, CURRENT_PRICE, ASKING_PRICE
+from .cache import cache
+from .times import now, to_local, to_utc
+
+ITEM_ORDER = [(Item.end_date, False), (Item.id, False)]
+USER_ORDER = [(User.id, False)]
+
+# ?sort= name -> sort expression and its value read from a loaded item, a leading '-' sorts descending
+ITEM_SORTS = {
+    'end_date': (Item.end_date, lambda item: item.end_date),
+    'current_price': (CURRENT_PRICE, lambda item: item.current_price if item.current_price is not None else item.asking_price or 0),
+    'asking_price': (ASKING_PRICE, lambda item: item.asking_price or 0),
+}
+
+# Lower bound included, upper bound excluded
+PRICE_BUCKETS = [(0, 50), (50, 100), (100, 500), (500, None)]
+ENDING = ('today', 'week')
+
+
+def active_conditions(current=None):
+    current = current or now()
+    return (
+        Item.status == Item.OPEN,
+        Item.start_date <= current,
+        Item.end_date > current
+    )
+
+
+def active_items(current=None):
+    return with_users(Item.query).filter(*active_conditions(current))
+
+
+def ending_soon(limit=3):
+    # Range scan over (status, end_date) from now on, the soonest ending started lots first
+    return active_items().order_by(Item.end_date, Item.id).limit(limit)
+
+
+def item_sort(sort=None):
+    """(order, key) for paginate() from a ?sort= value, unknown values sort by end date."""
+
+    sort = sort or 'end_date'
+    descending = sort.startswith('-')
+    column, value = ITEM_SORTS.get(sort.lstrip('-'), (None, None))
+
+    if column is None:
+        return ITEM_ORDER, None
+
+    return [(column, descending), (Item.id, descending)], lambda item: [value(item), item.id]
+
+
+def ending_bounds():
+    # Local midnight closing today and the local Monday midnight closing this week, in UTC
+    today = to_local(now()).date()
+    return {
+        'today': to_utc(datetime.combine(today + timedelta(1), time())),
+        'week': to_utc(datetime.combine(today + timedelta(7 - today.weekday()), time())),
+    }
+
+
+def listing_filters(args):
+    # ?min_price=&max_price=&seller=&ending=today|week, values that do not parse are ignored
+    return {
+        'min_price': args.get('min_price', type=float),
+        'max_price': args.get('max_price', type=float),
+        'seller': args.get('seller', type=int),
+        'ending': args.get('ending') if args.get('ending') in ENDING else None,
+    }
+
+
+def filter_items(query, min_price=None, max_price=None, seller=None, ending=None):
+    if min_price is not None:
+        query = query.filter(CURRENT_PRICE >= min_price)
+
+    if max_price is not None:
+        query = query.filter(CURRENT_PRICE < max_price)
+
+    if seller is not None:
+        query = query.filter(Item.owner_id == seller)
+
+    if ending is not None:
+        query = query.filter(Item.end_date < ending_bounds()[ending])
+
+    return query
+
+
+def item_facets(seller=None, tag=None):
+    """Numbers of active items per price bucket and ending window, optionally of one seller.
+    One aggregate query, cached in the 'listings' namespace under the listings version `tag`."""
+
+    key = cache.key('listings', 'facets', tag, seller)
+    facets = cache.get(key)
+
+    if facets is not None:
+        return facets
+
+    bounds = ending_bounds()
+    columns = [
+        func.count(case([(and_(CURRENT_PRICE >= low, *([CURRENT_PRICE < high] if high is not None else [])), 1)]))
+        for low, high in PRICE_BUCKETS
+    ] + [func.count(case([(Item.end_date < bounds[ending], 1)])) for ending in ENDING]
+
+    query = database.session.query(*columns).filter(*active_conditions())
+
+    if seller is not None:
+        query = query.filter(Item.owner_id == seller)
+
+    counts = query.one()
+    facets = {
+        'price': [(low, high, count) for (low, high), count in zip(PRICE_BUCKETS, counts)],
+        'ending': dict(zip(ENDING, counts[len(PRICE_BUCKETS):])),
+    }
+
+    cache.set(key, facets)
+    return facets
+
+
+def users_with_items_count():
+    # Rows of (User, number of items), page them with key=users_key
+    return database.session.query(User, func.count(Item.id)).outerjoin(Item, Item.owner_id == User.id).group_by(User.id)
+
+
+def users_key(row):
+    return [row[0].id]
@@ -1,12 +1,30 @@
+import hmac
+import io
+from concurrent.futures import TimeoutError
 from datetime import date
-from flask import jsonify, request, render_template, make_response, redirect, url_for
+from flask import jsonify, request, render_template, make_response, redirect, url_for, abort, Response, current_app, g
 from flask_restx import Api, Resource
 from flask_login import login_user, logout_user, current_user, login_required
-from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy.exc import IntegrityError
 
-from .models import Item, User
+from .models import Item, User, with_users
 from .models import database
-from .forms import LoginForm, RegisterForm, NewPriceForm, EditUserForm, AddItemForm, EditItemForm
+from .pagination import paginate
+from .queries import active_items, ending_soon, users_with_items_count, users_key, USER_ORDER
+from .queries import item_sort, listing_filters, filter_items, item_facets
+from .bidding import place_bid, item_bids, BID_ORDER, BidResult
+from .cache import cache
+from .events import events
+from .conditional import conditional, item_validator, listings_validator
+from .search import search_items, search_order, search_key
+from .principal import user_summary
+from .presence import presence
+from .metrics import metrics
+from .importing import import_items, IMPORT_MIMETYPES
+from .exporting import export_results, export_engine, day_bounds, FORMATS, STATUSES, MIMETYPES
+from .passwords import new_password_hash, check_user_password
+from .forms import LoginForm, RegisterForm, SearchForm, NewPriceForm, EditUserForm, AddItemForm, EditItemForm, item_dates_valid
+from .times import now, to_utc, to_local
 
 api = Api()
 
@@ -15,10 +33,12 @@ api = Api()
 class Home(Resource):
 
     @api.response(200, 'Success - Homepage is loaded')
+    @conditional(listings_validator)
+    @cache.cached('listings')
     def get(self):
-        user = None
+        user = user_summary()
         items = list()
-        items_data = Item.query.filter_by(end_date=date.today()).all()
+        items_data = ending_soon(current_app.config['HOME_ENDING_SOON']).all()
         info = {
             'title': "Witaj na stronie głównej",
             'description': """Obecnie znajdujesz się na stronie głównej.
@@ -27,13 +47,6 @@ class Home(Resource):
             W tym miejscu znajdziesz informację o stronach lub opcje do podstron serwisu."""
         }
 
-        if current_user.is_authenticated:
-            user = {
-                'id': current_user.id,
-                'nick': current_user.nick,
-                'admin': current_user.admin
-            }
-
         if items_data:
             for item in items_data:
                 items.append({
@@ -44,20 +57,17 @@ class Home(Resource):
                         'end_date': item.end_date,
                         'asking_price': item.asking_price,
                         'current_price': item.current_price,
-                        'owner': User.query.get(item.owner_id).nick
+                        'owner': item.owner.nick,
+                        'version': item.version,
+                        'updated_at': item.updated_at
                 })
 
-            if len(items) > 2:
-                items = items[:3]
-
         return make_response(render_template('home.html', user=user, items=items, info=info), 200)
 
 
     @api.response(303, 'See Other - Correct logout')
     def post(self):
-        current_user.active = False
-        database.session.add(current_user)
-        database.session.commit()
+        presence.mark(current_user.id, False)
         logout_user()
         return redirect('home', 303)
    
@@ -78,30 +88,48 @@ class Register(Resource):
 
     @api.response(303, 'See Other - User is add to database')
     @api.response(400, 'Bad request - Incorrect form value')
+    @api.response(503, 'Service Unavailable - Password hashing timed out')
     @api.expect(api.model('User', User.FIELDS))
     def post(self):
         form = RegisterForm()
+        info = {
+            'title': "Rejestracja",
+            'description': """Do zarejestrowania w serwisie wystarczą tylko podstawowe informacje."""
+        }
         
         if form.validate_on_submit():
+            if User.nick_exists(form.nick.data):
+                return make_response(render_template('register.html', info=info, form=form), 400)
+
+            # Hashing takes most of the request, it runs in the password pool
+            try:
+                password = new_password_hash(form.password.data)
+            except TimeoutError:
+                return make_response(render_template('register.html', info=info, form=form), 503)
+
             user = User(
                 nick = form.nick.data,
                 first_name = form.first_name.data,
                 last_name = form.last_name.data,
-                password = generate_password_hash(form.password.data, 'sha256'),
+                password = password,
                 register_date = date.today(),
                 active = True,
                 admin = False,
                 user_items = []
             )
 
-            if user.nick in [u.nick for u in User.query.all()]:
-                return make_response(render_template('register.html', form=form), 400)
-
-            database.session.add(user)
-            database.session.commit()
+            # Two signups with the same nick can both pass the check above, the unique index decides
+            try:
+                database.session.add(user)
+                database.session.commit()
+            except IntegrityError:
+                database.session.rollback()
+                return make_response(render_template('register.html', info=info, form=form), 400)
 
             return redirect('home', 303)
 
+        return make_response(render_template('register.html', info=info, form=form), 400)
+
 
 @api.route('/login')
 class Login(Resource):
@@ -128,11 +156,13 @@ class Login(Resource):
         if form.validate_on_submit():
             user = User.query.filter_by(nick=form.nick.data).first()
 
-            if user and check_password_hash(user.password, form.password.data):
+            if check_user_password(user, form.password.data):
+                # Only an upgraded hash needs writing
+                if database.session.is_modified(user):
+                    database.session.commit()
+
                 login_user(user)
-                user.active = True
-                database.session.add(user)
-                database.session.commit()
+                presence.mark(user.id, True)
                 return redirect('home', 303)
 
         return make_response(render_template('login.html', form=form), 400)
@@ -144,32 +174,25 @@ class UsersAll(Resource):
 
     @api.response(200, 'Success - List of users is loaded')
     def get(self):
-        users_data = User.query.all()
+        page = paginate(users_with_items_count(), USER_ORDER, key=users_key)
         users = list()
-        user = None
+        user = user_summary()
         info = {
             'title': "Lista użytkowników",
             'description': """Znajdziesz tutaj karty wszystkich użytkowników zarejestrowanych w serwisie."""
         }
 
-        if current_user.is_authenticated:
-            user = {
-                'id': current_user.id,
-                'nick': current_user.nick,
-                'admin': current_user.admin
-            }
-
-        for u in users_data:
+        for u, items_count in page.items:
             users.append({
                 'id': u.id,
                 'nick': u.nick,
                 'first_name': u.first_name,
                 'last_name': u.last_name,
                 'register_date': u.register_date,
-                'user_items': len(u.user_items)
+                'user_items': items_count
             })
 
-        return make_response(render_template('user_show_all.html', user=user, info=info, users=users), 200)
+        return make_response(render_template('user_show_all.html', user=user, info=info, users=users, page=page), 200)
 
 
 @api.route('/user/<int:user_id>')
@@ -196,10 +219,11 @@ class UserOne(Resource):
 
     @api.response(401, 'Unauthorized — Login required')
     @api.response(303, 'See Other - Correct form')
+    @api.response(503, 'Service Unavailable - Password hashing timed out')
     @api.expect(api.model('User', User.FIELDS))
     @login_required
     def post(self, user_id):
-        user = current_user
+        user = User.query.get(current_user.id)
         form = EditUserForm()
         info = {
             'title': "Strona twojego profilu",
@@ -221,8 +245,12 @@ class UserOne(Resource):
             user.first_name = form.first_name.data
             user.last_name = form.last_name.data
 
-            if request.form.get('new_password') and check_password_hash(user.password, request.form.get('old_password')):
-                user.password = generate_password_hash(request.form.get('new_password'), 'sha256')
+            if request.form.get('new_password') and check_user_password(user, request.form.get('old_password')):
+                try:
+                    user.password = new_password_hash(request.form.get('new_password'))
+                except TimeoutError:
+                    database.session.rollback()
+                    return make_response(render_template('user.html', user=user, info=info, form=form), 503)
 
  
             for item in user.user_items:
@@ -230,94 +258,152 @@ class UserOne(Resource):
                     user.user_items.remove(item)
                     database.session.delete(item)
                 
-            database.session.add(user)
-            database.session.commit()
+            try:
+                database.session.add(user)
+                database.session.commit()
+            except IntegrityError:
+                database.session.rollback()
+                return make_response(render_template('user.html', user=user, info=info, form=form), 400)
 
 
         return make_response(render_template('user.html', user=user, info=info, form=form), 200)
 
 
 #================================================================
+def listing_url(**changes):
+    # Current /items arguments with `changes` applied, None drops an argument, paging starts over
+    args = {k: v for k, v in request.args.items() if k not in ('after', 'before')}
+    args.update(changes)
+    return url_for('items_all', **{k: v for k, v in args.items() if v is not None})
+
+
 @api.route('/items')
 class ItemsAll(Resource):
 
     @api.response(200, 'Success - List of items is loaded')
+    @conditional(listings_validator)
+    @cache.cached('listings')
     def get(self):
-        items_data = Item.query.all()
+        filters = listing_filters(request.args)
+        order, key = item_sort(request.args.get('sort'))
+        page = paginate(filter_items(active_items(), **filters), order, key=key)
+        facets = item_facets(filters['seller'], g.get('cache_tag'))
         items = list()
-        today_date = date.today()
-        user = None
+        user = user_summary()
         info = {
             'title': "Lista ofert",
             'description': """Znajdziesz tutaj listę wszystkich ofert dostępnych na serwisie.
-            Każda oferta zaczyna się dokładnie o 00:00 i kończy o 23:59.
-            Zmiana godziny rozpoczęcia jest niemożliwa (przynajmniej na razie)."""
+            Każda oferta ma własną godzinę rozpoczęcia i zakończenia.
+            Oferty możesz sortować po cenie lub dacie zakończenia i zawęzić do przedziału cen lub sprzedawcy."""
         }
 
-        if current_user.is_authenticated:
-            user = {
-                'id': current_user.id,
-                'nick': current_user.nick,
-                'admin': current_user.admin
-            }
+        for item in page.items:
+            items.append({
+                'id': item.id,
+                'name': item.name,
+                'description': item.description,
+                'start_date': item.start_date,
+                'end_date': item.end_date,
+                'asking_price': item.asking_price,
+                'current_price': item.current_price,
+                'owner': item.owner.nick,
+                'owner_id': item.owner_id,
+                'version': item.version,
+                'updated_at': item.updated_at
+            })
 
-        for item in items_data:
-            if today_date >= item.start_date and today_date <= item.end_date:
-                items.append({
-                    'id': item.id,
-                    'name': item.name,
-                    'description': item.description,
-                    'start_date': item.start_date,
-                    'end_date': item.end_date,
-                    'asking_price': item.asking_price,
-                    'current_price': item.current_price,
-                    'owner': User.query.get(item.owner_id).nick
-                })
+        return make_response(render_template('item_show_all.html', user=user, info=info, items=items, page=page,
+            facets=facets, filters=filters, sort=request.args.get('sort', 'end_date'), listing_url=listing_url), 200)
 
-        return make_response(render_template('item_show_all.html', user=user, info=info, items=items), 200)
+
+@api.route('/search')
+class ItemsSearch(Resource):
+
+    @api.response(200, 'Success - Search form and ranked matching items')
+    def get(self):
+        form = SearchForm(request.args)
+        page = None
+        items = list()
+        user = user_summary()
+        info = {
+            'title': "Wyszukiwarka ofert",
+            'description': """Wpisz słowa z nazwy lub opisu oferty.
+            Początek słowa wystarczy, aby znaleźć ofertę po nazwie.
+            Najlepiej dopasowane oferty są na początku listy."""
+        }
+
+        if form.validate():
+            query, rank = search_items(form.q.data)
+
+            if query is not None:
+                page = paginate(query, search_order(rank), key=search_key)
+
+                for item, _ in page.items:
+                    items.append({
+                        'id': item.id,
+                        'name': item.name,
+                        'description': item.description,
+                        'start_date': item.start_date,
+                        'end_date': item.end_date,
+                        'asking_price': item.asking_price,
+                        'current_price': item.current_price,
+                        'owner': item.owner.nick,
+                        'version': item.version,
+                        'updated_at': item.updated_at
+                    })
+
+        return make_response(render_template('search.html', user=user, info=info, form=form, items=items, page=page), 200)
 
 
 @api.route('/item/<int:item_id>')
 class ItemOne(Resource):
 
     @api.response(200, 'Success - Item is loaded')
+    @conditional(item_validator)
+    @cache.cached('item')
     def get(self, item_id):
-        item_data = Item.query.get(item_id)
+        item_data = with_users(Item.query).get(item_id)
         form = NewPriceForm()
-        user = None
+        user = user_summary()
         info = {
             'title': "Strona oferty",
             'description': """Znajdują się tu wszytkie informacje na temat oferty oraz możliwość podbijania ceny jeśli jest się zalogowanym."""
         }
 
-        if current_user.is_authenticated:
-            user = {
-                'id': current_user.id,
-                'nick': current_user.nick,
-                'admin': current_user.admin
+        if not item_data:
+            abort(404)
+
+        item = {
+                'id': item_data.id,
+                'name': item_data.name,
+                'description': item_data.description,
+                'start_date': item_data.start_date,
+                'end_date': item_data.end_date,
+                'asking_price': item_data.asking_price,
+                'current_price': item_data.current_price,
+                'owner': item_data.owner.nick,
+                'owner_id': item_data.owner_id
             }
 
-        if item_data:
-            item = {
-                    'id': item_data.id,
-                    'name': item_data.name,
-                    'description': item_data.description,
-                    'start_date': item_data.start_date,
-                    'end_date': item_data.end_date,
-                    'asking_price': item_data.asking_price,
-                    'current_price': item_data.current_price,
-                    'owner': User.query.get(item_data.owner_id).nick,
-                    'owner_id': item_data.owner_id
-                }
+        if item_data.winner_id:
+            item['winner'] = item_data.winner.nick
+            item['winner_id'] = item_data.winner_id
 
-            if item_data.winner_id:
-                item['winner'] = User.query.get(item_data.winner_id).nick
-                item['winner_id'] = item_data.winner_id
+        #if not item_data.images:
+        #    item['images'] = [{ 'file': "_noimage.jpg", 'alt': "Brak zdjęcia" }]
 
-            #if not item_data.images:
-            #    item['images'] = [{ 'file': "_noimage.jpg", 'alt': "Brak zdjęcia" }]
+        page = paginate(item_bids(item_id), BID_ORDER)
+        bids = list()
 
-        return make_response(render_template('item_show_one.html', user=user, info=info, item=item, form=form), 200)
+        for bid in page.items:
+            bids.append({
+                'amount': bid.amount,
+                'timestamp': bid.timestamp,
+                'user': bid.user.nick if bid.user else None
+            })
+
+        return make_response(render_template('item_show_one.html', user=user, info=info, item=item, form=form,
+            bids=bids, page=page, bid_result=request.args.get('bid')), 200)
 
 
     @api.response(401, 'Unauthorized — Login required')
@@ -326,23 +412,32 @@ class ItemOne(Resource):
     def post(self, item_id):
         form = NewPriceForm()
         
-        if form.validate_on_submit():
-            item = Item.query.get(item_id)
-            user = {
-                'id': current_user.id,
-                'nick': current_user.nick,
-                'admin': current_user.admin
-            }
+        if form.validate_on_submit() and form.new_price.data is not None:
+            result = place_bid(item_id, current_user.id, form.new_price.data)
+
+            if result == BidResult.ACCEPTED:
+                events.publish(f'item:{item_id}', {
+                    'type': 'bid',
+                    'item_id': item_id,
+                    'current_price': form.new_price.data,
+                    'winner_id': current_user.id,
+                    'winner': current_user.nick
+                })
 
-            if item.current_price < form.new_price.data:
-                item.current_price = form.new_price.data
-                item.winner_id = user['id']
+            return redirect(url_for('item_one', item_id=item_id, bid=result.value), 303)
 
-                database.session.add(item)
-                database.session.commit()
+        return redirect(url_for('item_one', item_id=item_id), 303)
 
-        return redirect(f'{item_id}', 303)
-        
+
+@api.route('/item/<int:item_id>/events')
+class ItemEvents(Resource):
+
+    @api.response(200, 'Success - Stream of price changes (text/event-stream)')
+    def get(self, item_id):
+        return Response(events.stream(f'item:{item_id}'), mimetype='text/event-stream', headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        })
 
 
 @api.route('/items/add')
@@ -370,6 +465,10 @@ class ItemAdd(Resource):
     def post(self):
         user = current_user
         form = AddItemForm()
+        info = {
+            'title': "Dodawanie oferty",
+            'description': """Widzisz formularz dodawania oferty."""
+        }
 
         if form.validate_on_submit():
             item = Item(
@@ -377,16 +476,13 @@ class ItemAdd(Resource):
                 description = form.description.data,
                 asking_price = form.asking_price.data,
                 current_price = form.asking_price.data,
-                start_date = form.start_date.data,
-                end_date = form.end_date.data,
+                start_date = to_utc(form.start_date.data),
+                end_date = to_utc(form.end_date.data),
                 owner_id = user.id
             )
 
-            if item.start_date > item.end_date:
-                return make_response(render_template('add_item.html', user=user, form=form), 400)
-
-            if item.start_date < date.today():
-                return make_response(render_template('add_item.html', user=user, form=form), 400)
+            if not item_dates_valid(item.start_date, item.end_date):
+                return make_response(render_template('add_item.html', user=user, info=info, form=form), 400)
 
             database.session.add(item)
             database.session.commit()
@@ -394,6 +490,86 @@ class ItemAdd(Resource):
         return redirect(url_for('items_all'), 303)
 
 
+@api.route('/items/import')
+class ItemsImport(Resource):
+
+    @api.response(200, 'Success - Counts of imported and failed rows')
+    @api.response(400, 'Bad request - Unknown owner')
+    @api.response(403, 'Forbidden - Admins only')
+    @api.response(415, 'Unsupported Media Type - Content-Type must be text/csv or application/x-ndjson')
+    @api.doc(params={'owner': 'Nick of the seller'})
+    def post(self):
+        if not (current_user.is_authenticated and current_user.admin):
+            abort(403)
+
+        # The cookie is the only credential, a cross-site form cannot send these types without a preflight
+        format = IMPORT_MIMETYPES.get(request.mimetype)
+
+        if format is None:
+            abort(415)
+
+        owner = User.query.filter_by(nick=request.args.get('owner')).first()
+
+        if owner is None:
+            abort(400)
+
+        # Read while importing, the body is never held in memory as a whole.
+        # newline='' keeps line breaks inside quoted CSV fields
+        source = io.TextIOWrapper(request.stream, encoding='utf-8', newline='')
+        result = import_items(source, format, owner.id,
+            current_app.config.get('IMPORT_BATCH_SIZE', 1000), current_app.config.get('IMPORT_MAX_ERRORS', 100))
+
+        return jsonify(result.as_dict())
+
+
+@api.route('/items/export')
+class ItemsExport(Resource):
+
+    @api.response(200, 'Success - Auction results as a CSV or JSON lines stream')
+    @api.response(400, 'Bad request - Unknown seller, format, status or date')
+    @api.response(403, 'Forbidden - Admins only')
+    @api.doc(params={
+        'format': 'csv (default) or jsonl',
+        'start': 'First day the auctions ended on, YYYY-MM-DD',
+        'end': 'Last day the auctions ended on, YYYY-MM-DD',
+        'seller': 'Nick of the owner',
+        'status': 'closed (default), open or all'
+    })
+    def get(self):
+        if not (current_user.is_authenticated and current_user.admin):
+            abort(403)
+
+        format = request.args.get('format', 'csv')
+        status = request.args.get('status', Item.CLOSED)
+        seller_id = None
+
+        try:
+            start, end = day_bounds(*[
+                date.fromisoformat(request.args[name]) if request.args.get(name) else None for name in ('start', 'end')
+            ])
+        except ValueError:
+            abort(400)
+
+        if request.args.get('seller'):
+            seller = User.query.filter_by(nick=request.args['seller']).first()
+
+            if seller is None:
+                abort(400)
+
+            seller_id = seller.id
+
+        if format not in FORMATS or status not in STATUSES:
+            abort(400)
+
+        # Rows are read while the response is sent, from a connection of the generator
+        chunks = export_results(export_engine(current_app._get_current_object()), format,
+            current_app.config.get('EXPORT_CHUNK_SIZE', 1000), start=start, end=end, seller_id=seller_id, status=status)
+
+        return Response(chunks, mimetype=MIMETYPES[format], headers={
+            'Content-Disposition': f'attachment; filename=auctions.{format}'
+        })
+
+
 @api.route('/item/edit/<int:item_id>')
 class ItemEdit(Resource):
 
@@ -403,7 +579,6 @@ class ItemEdit(Resource):
     def get(self, item_id):
         user = current_user
         item = Item.query.get(item_id)
-        today_date = date.today()
         info = {
             'title': "Edytuj ofertę",
             'description': """Widzisz formularz oferty który może zawierać informacje zablokowane
@@ -413,11 +588,11 @@ class ItemEdit(Resource):
         form = AddItemForm()
         form.name.default = item.name
         form.description.default = item.description
-        form.start_date.default = item.start_date
-        form.end_date.default = item.end_date
+        form.start_date.default = to_local(item.start_date)
+        form.end_date.default = to_local(item.end_date)
         form.process()
         
-        return make_response(render_template('edit_item.html', user=user, info=info, item=item, today_date=today_date, form=form), 200)
+        return make_response(render_template('edit_item.html', user=user, info=info, item=item, now=now(), form=form), 200)
 
 
     @api.response(401, 'Unauthorized — Login required')
@@ -430,22 +605,43 @@ class ItemEdit(Resource):
         user = current_user
         item = Item.query.get(item_id)
         form = EditItemForm()
+        info = {
+            'title': "Edytuj ofertę",
+            'description': """Widzisz formularz oferty który może zawierać informacje zablokowane
+            np. nie można zmienić daty rozpoczęcia jeśli ta już się rozpoczeła."""
+        }
 
         if form.validate_on_submit():
             item.name = form.name.data
             item.description = form.description.data
             item.asking_price = form.asking_price.data
             item.current_price = form.asking_price.data
-            item.start_date = form.start_date.data
-            item.end_date = form.end_date.data
-
-            if item.start_date > item.end_date:
-                return make_response(render_template('edit_item.html', user=user, form=form), 400)
+            item.start_date = to_utc(form.start_date.data)
+            item.end_date = to_utc(form.end_date.data)
 
-            if item.start_date < date.today():
-                return make_response(render_template('edit_item.html', user=user, form=form), 400)
+            if not item_dates_valid(item.start_date, item.end_date):
+                return make_response(render_template('edit_item.html', user=user, info=info, item=item, now=now(), form=form), 400)
 
             database.session.add(item)
             database.session.commit()
         
         return redirect(url_for("user_one", user_id=user.id), 303)
+
+
+#================================================================
+@api.route('/metrics')
+class Metrics(Resource):
+
+    @api.response(200, 'Success - Histograms in the Prometheus text format')
+    @api.response(403, 'Forbidden - Admins or the METRICS_TOKEN bearer only')
+    def get(self):
+        token = current_app.config.get('METRICS_TOKEN')
+        authorization = request.headers.get('Authorization', '')
+
+        # Prometheus cannot log in, it scrapes with the token
+        if token and hmac.compare_digest(authorization, f'Bearer {token}'):
+            pass
+        elif not (current_user.is_authenticated and current_user.admin):
+            abort(403)
+
+        return Response(metrics.exposition(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,92 @@
+import re
+from sqlalchemy import DDL, cast, Float, event, func, literal_column, table, column
+
+from .models import Item, database
+from .queries import active_items
+
+WORD = re.compile(r'\w+')
+
+# bm25/ts_rank weights - a hit in the name counts more than one in the description
+NAME_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+
+# External content FTS5 index over item(name, description), rowid = item.id.
+# The update trigger fires only when the text changes, bids and closing never touch the index.
+SQLITE_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS item_search USING fts5(
+        name, description, content='item', content_rowid='id', prefix='2 3')""",
+    """CREATE TRIGGER IF NOT EXISTS item_search_insert AFTER INSERT ON item BEGIN
+        INSERT INTO item_search(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS item_search_delete AFTER DELETE ON item BEGIN
+        INSERT INTO item_search(item_search, rowid, name, description) VALUES ('delete', old.id, old.name, old.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS item_search_update AFTER UPDATE OF name, description ON item BEGIN
+        INSERT INTO item_search(item_search, rowid, name, description) VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO item_search(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END""",
+]
+
+# Postgres keeps a weighted tsvector column current by itself, name as 'A' and description as 'B'
+POSTGRES_DDL = [
+    """ALTER TABLE item ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(name, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(description, '')), 'B')) STORED""",
+    """CREATE INDEX ix_item_search_vector ON item USING gin (search_vector)""",
+]
+
+for statement in SQLITE_DDL:
+    event.listen(Item.__table__, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+
+for statement in POSTGRES_DDL:
+    event.listen(Item.__table__, 'after_create', DDL(statement).execute_if(dialect='postgresql'))
+
+event.listen(Item.__table__, 'before_drop', DDL('DROP TABLE IF EXISTS item_search').execute_if(dialect='sqlite'))
+
+item_search = table('item_search', column('rowid'))
+search_vector = literal_column('item.search_vector')
+
+
+def words(phrase):
+    return WORD.findall(phrase.lower())[:16]
+
+
+def sqlite_query(terms):
+    # Every word has to appear as a whole word, or start a word of the name
+    return ' AND '.join(f'("{term}" OR name : "{term}"*)' for term in terms)
+
+
+def postgres_query(terms):
+    return ' & '.join(f'({term} | {term}:*A)' for term in terms)
+
+
+def search_items(phrase):
+    """Active items matching `phrase` and their rank expression, lower rank is a better match.
+    Returns (query, rank) for paginate(), or (None, None) when the phrase has no words."""
+
+    terms = words(phrase)
+
+    if not terms:
+        return None, None
+
+    if database.engine.dialect.name == 'postgresql':
+        tsquery = func.to_tsquery('simple', postgres_query(terms))
+        # ts_rank_cd answers in real, widened so the value survives a round trip through the cursor
+        weights = literal_column(f"'{{0, 0, {DESCRIPTION_WEIGHT / NAME_WEIGHT}, 1}}'")
+        rank = cast(-func.ts_rank_cd(weights, search_vector, tsquery), Float(precision=53))
+        query = active_items().filter(search_vector.op('@@')(tsquery))
+    else:
+        rank = func.bm25(literal_column('item_search'), NAME_WEIGHT, DESCRIPTION_WEIGHT, type_=Float)
+        query = active_items().join(item_search, item_search.c.rowid == Item.id).filter(
+            literal_column('item_search').op('MATCH')(sqlite_query(terms))
+        )
+
+    return query.add_columns(rank.label('rank')), rank
+
+
+def search_order(rank):
+    return [(rank, False), (Item.id, False)]
+
+
+def search_key(row):
+    return [row.rank, row.Item.id]
@@ -0,0 +1,25 @@
+import pytz
+from datetime import datetime
+from flask import current_app
+
+# Auction times are stored as naive UTC, forms and pages use TIMEZONE
+
+
+def now():
+    return datetime.utcnow()
+
+
+def local_zone():
+    return pytz.timezone(current_app.config.get('TIMEZONE', 'UTC'))
+
+
+def to_utc(value):
+    return local_zone().localize(value).astimezone(pytz.utc).replace(tzinfo=None)
+
+
+def to_local(value):
+    return pytz.utc.localize(value).astimezone(local_zone()).replace(tzinfo=None)
+
+
+def localtime(value, format='%Y-%m-%d %H:%M'):
+    return to_local(value).strftime(format) if value else ''
@@ -0,0 +1,148 @@
+"""Read throughput of /items while bids are written concurrently, SQLite with and without the pragmas.
+Readers and writers are separate processes, like gunicorn workers.
+
+    python -m benchmarks.concurrent_reads --duration 10 --readers 4 --writers 2
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+from auction_site import app
+from auction_site.models import database, User, Item
+from auction_site.bidding import place_bid
+from auction_site.cache import cache, NullBackend
+from auction_site.engine import SQLITE_PRAGMAS
+
+# 'before' is SQLite as it comes: rollback journal, full sync, no mmap
+MODES = {
+    'before': {name: None for name in SQLITE_PRAGMAS},
+    'after': {name: app.config.get(f'SQLITE_{name.upper()}') for name in SQLITE_PRAGMAS},
+}
+
+
+def seed(items):
+    database.create_all()
+    database.session.add_all([
+        User(nick=f'Bidder{i}', password='x', register_date=date.today()) for i in range(10)
+    ])
+    database.session.commit()
+
+    current = datetime.utcnow()
+    database.session.execute(Item.__table__.insert(), [{
+        'name': f'Item{i}',
+        'description': 'Benchmark item',
+        'asking_price': 1.0,
+        'current_price': 1.0,
+        'start_date': current - timedelta(hours=1),
+        'end_date': current + timedelta(days=1, seconds=i),
+        'owner_id': 1,
+        'status': Item.OPEN,
+        'version': 1,
+        'updated_at': current
+    } for i in range(items)])
+    database.session.commit()
+
+
+def reader(stop, results, seed):
+    random.seed(seed)
+    client = app.test_client()
+    latencies = list()
+
+    while not stop.is_set():
+        started = time.perf_counter()
+        response = client.get('/items?sort=-current_price')
+        latencies.append(time.perf_counter() - started)
+        assert response.status_code == 200
+
+    results.put(('read', latencies))
+
+
+def writer(stop, results, seed, items):
+    random.seed(seed)
+    counts = {'bids': 0, 'errors': 0}
+
+    with app.app_context():
+        while not stop.is_set():
+            try:
+                place_bid(random.randint(1, items), random.randint(2, 10), time.time() - 1.6e9)
+                counts['bids'] += 1
+            except Exception:
+                database.session.rollback()
+                counts['errors'] += 1
+            finally:
+                database.session.remove()
+
+    results.put(('write', counts))
+
+
+def run(mode, args, directory):
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(directory, f'{mode}.db')
+    app.config.update({f'SQLITE_{name.upper()}': value for name, value in MODES[mode].items()})
+
+    with app.app_context():
+        seed(args.items)
+        # SQLite files are not pooled, nothing opened here leaks into the children
+        database.engine.dispose()
+
+    context = multiprocessing.get_context('fork')
+    stop = context.Event()
+    results = context.Queue()
+    processes = [context.Process(target=reader, args=(stop, results, i)) for i in range(args.readers)]
+    processes += [context.Process(target=writer, args=(stop, results, i, args.items)) for i in range(args.writers)]
+
+    for process in processes:
+        process.start()
+
+    time.sleep(args.duration)
+    stop.set()
+
+    latencies = list()
+    counts = {'bids': 0, 'errors': 0}
+
+    for _ in processes:
+        kind, value = results.get()
+
+        if kind == 'read':
+            latencies += value
+        else:
+            counts = {key: counts[key] + value[key] for key in counts}
+
+    for process in processes:
+        process.join()
+
+    latencies.sort()
+    return {
+        'reads/s': len(latencies) / args.duration,
+        'read p50 ms': statistics.median(latencies) * 1000,
+        'read p95 ms': latencies[int(len(latencies) * 0.95)] * 1000,
+        'bids/s': counts['bids'] / args.duration,
+        'write errors': counts['errors'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--duration', type=float, default=10.0, help="Seconds per mode.")
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--items', type=int, default=5000)
+    args = parser.parse_args()
+
+    # Measure the database, not the response cache
+    cache.backend = NullBackend()
+
+    with tempfile.TemporaryDirectory() as directory:
+        results = {mode: run(mode, args, directory) for mode in MODES}
+
+    print(f"{'':14}" + ''.join(f'{mode:>12}' for mode in results))
+    for metric in results['before']:
+        print(f'{metric:14}' + ''.join(f'{result[metric]:12.1f}' for result in results.values()))
+
+
+if __name__ == '__main__':
+    main()
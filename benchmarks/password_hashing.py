@@ -0,0 +1,133 @@
+"""Hash time and /login, /register and password change throughput per password hashing cost,
+to pick PASSWORD_METHOD for the hardware. Requests are sent from threads, hashing runs in the PASSWORD_WORKERS pool.
+
+    python -m benchmarks.password_hashing --duration 5 --clients 4
+"""
+import argparse
+import itertools
+import os
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+from auction_site import app
+from auction_site.models import database, User
+from auction_site.cache import cache, NullBackend
+from auction_site.passwords import hash_password
+from auction_site.presence import presence
+
+# 'sha256' is the old single round hash, the rest are candidates for PASSWORD_METHOD
+METHODS = (
+    'sha256',
+    'pbkdf2:sha256:100000',
+    'pbkdf2:sha256:260000',
+    'pbkdf2:sha256:600000',
+    'scrypt:16384:8:1',
+    'scrypt:32768:8:1',
+)
+
+
+def hash_time(method, rounds):
+    timings = list()
+
+    for _ in range(rounds):
+        started = time.perf_counter()
+        hash_password('benchmarkPassword', method, 16)
+        timings.append(time.perf_counter() - started)
+
+    return statistics.median(timings)
+
+
+def timed(send, seconds, status):
+    latencies = list()
+    stop = time.perf_counter() + seconds
+
+    while time.perf_counter() < stop:
+        started = time.perf_counter()
+        response = send()
+        latencies.append(time.perf_counter() - started)
+        assert response.status_code == status, response.status_code
+
+    return latencies
+
+
+def login(seconds):
+    client = app.test_client()
+    return timed(lambda: client.post('/login', data={'nick': 'Bidder', 'password': 'benchmarkPassword'}), seconds, 303)
+
+
+nicks = itertools.count()
+
+
+def register(seconds):
+    client = app.test_client()
+    return timed(lambda: client.post('/register', data={'nick': f'New{next(nicks)}', 'password': 'benchmarkPassword'}), seconds, 303)
+
+
+def change_password(seconds):
+    # The old password is verified and the new one hashed, it stays the same so every request succeeds
+    client = app.test_client()
+    client.post('/login', data={'nick': 'Bidder', 'password': 'benchmarkPassword'})
+    data = {'nick': 'Bidder', 'old_password': 'benchmarkPassword', 'new_password': 'benchmarkPassword'}
+
+    return timed(lambda: client.post('/user/1', data=data), seconds, 200)
+
+
+def summary(name, latencies, seconds):
+    latencies = sorted(latencies)
+
+    return {
+        f'{name}/s': len(latencies) / seconds,
+        f'{name} p50 ms': statistics.median(latencies) * 1000,
+        f'{name} p95 ms': latencies[int(len(latencies) * 0.95)] * 1000,
+    }
+
+
+def run(method, args):
+    app.config['PASSWORD_METHOD'] = method
+
+    with app.app_context():
+        database.drop_all()
+        database.create_all()
+        database.session.add(User(nick='Bidder', password=hash_password('benchmarkPassword', method, 16), register_date=date.today()))
+        database.session.commit()
+        seconds = hash_time(method, args.rounds)
+
+    result = {'hash ms': seconds * 1000}
+
+    for name, workload in (('login', login), ('register', register), ('change', change_password)):
+        with ThreadPoolExecutor(args.clients) as clients:
+            latencies = sum(clients.map(workload, [args.duration] * args.clients), [])
+
+        result.update(summary(name, latencies, args.duration))
+
+    presence.pending.clear()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--duration', type=float, default=5.0, help="Seconds of each workload per method.")
+    parser.add_argument('--clients', type=int, default=4)
+    parser.add_argument('--rounds', type=int, default=5, help="Hashes timed per method.")
+    args = parser.parse_args()
+
+    app.config['TESTING'] = True
+    app.config['WTF_CSRF_ENABLED'] = False
+    app.config['PASSWORD_VERIFY_TIMEOUT'] = 60
+    cache.backend = NullBackend()
+
+    # Registrations and password changes write from several threads, an in-memory database is one connection
+    with tempfile.TemporaryDirectory() as directory:
+        app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(directory, 'passwords.db')}"
+        results = {method: run(method, args) for method in METHODS}
+
+    print(f"{'':22}" + ''.join(f'{metric:>17}' for metric in results[METHODS[0]]))
+    for method, result in results.items():
+        print(f'{method:22}' + ''.join(f'{value:17.1f}' for value in result.values()))
+
+
+if __name__ == '__main__':
+    main()
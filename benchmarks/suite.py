@@ -0,0 +1,481 @@
+"""Latency, throughput and SQL queries of every page on a seeded dataset, compared against a JSON baseline.
+Runs through the Flask test client (inprocess) or against gunicorn workers on localhost (server).
+
+    python -m benchmarks.suite --scale 1k --save            # write benchmarks/baselines/1k-inprocess.json
+    python -m benchmarks.suite --scale 1k --check           # exit 1 when a page got slower than the baseline
+    python -m benchmarks.suite --scale 100k --mode server --workers 4 --clients 8
+
+Seeded databases are kept in --data and reused, the same --scale and --seed give the same rows.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import re
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from http.cookiejar import CookieJar
+
+from sqlalchemy import event
+
+from auction_site import app
+from auction_site.models import database, User, Item, Bid
+from auction_site.cache import cache, NullBackend
+from auction_site.passwords import hash_password
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+PASSWORD = 'benchmarkPassword'
+CHUNK = 10000
+
+SCALES = {
+    '1k': {'items': 1000, 'users': 10000},
+    '100k': {'items': 100000, 'users': 10000},
+    '1m': {'items': 1000000, 'users': 1000000},
+}
+
+WORDS = ('rower', 'lampa', 'zegarek', 'krzesło', 'obraz', 'telefon', 'książka', 'płyta', 'aparat', 'stół',
+    'stary', 'nowy', 'drewniany', 'srebrny', 'zabytkowy', 'używany', 'czerwony', 'duży', 'mały', 'komplet')
+
+#================================================================
+# Dataset
+
+def seed(scale, rng):
+    """Users, open and closed items and their bids - every value comes from `rng`,
+    dates are offsets from the moment of seeding."""
+
+    sizes = SCALES[scale]
+    password = hash_password(PASSWORD, app.config['PASSWORD_METHOD'], 16)
+    current = datetime.utcnow().replace(microsecond=0)
+    register_date = current.date() - timedelta(days=365)
+
+    database.drop_all()
+    database.create_all()
+
+    for start in range(0, sizes['users'], CHUNK):
+        database.session.execute(User.__table__.insert(), [{
+            'nick': f'user{i}',
+            'first_name': rng.choice(WORDS).capitalize(),
+            'register_date': register_date + timedelta(days=rng.randrange(365)),
+            'password': password,
+        } for i in range(start, min(start + CHUNK, sizes['users']))])
+
+    for start in range(0, sizes['items'], CHUNK):
+        items, bids = list(), list()
+
+        for i in range(start, min(start + CHUNK, sizes['items'])):
+            closed = rng.random() < 0.1
+            start_date = current - timedelta(hours=rng.randrange(1, 24 * 30))
+            end_date = current - timedelta(hours=rng.randrange(1, 24)) if closed else current + timedelta(minutes=rng.randrange(10, 60 * 24 * 30))
+            asking_price = float(rng.randrange(1, 2000))
+            amounts = [asking_price + step for step in range(1, rng.choice((0, 0, 0, 1, 3, 6)) + 1)]
+            bidders = [rng.randrange(1, sizes['users'] + 1) for _ in amounts]
+
+            items.append({
+                'id': i + 1,
+                'name': ' '.join(rng.sample(WORDS, 3)).capitalize(),
+                'description': ' '.join(rng.choices(WORDS, k=20)),
+                'asking_price': asking_price,
+                'current_price': amounts[-1] if amounts else None,
+                'start_date': start_date,
+                'end_date': end_date,
+                'owner_id': rng.randrange(1, sizes['users'] + 1),
+                'winner_id': bidders[-1] if amounts else None,
+                'status': Item.CLOSED if closed else Item.OPEN,
+                'version': 1,
+                'updated_at': start_date,
+            })
+            bids += [{
+                'item_id': i + 1,
+                'user_id': user_id,
+                'amount': amount,
+                'timestamp': start_date + timedelta(minutes=step),
+            } for step, (amount, user_id) in enumerate(zip(amounts, bidders))]
+
+        database.session.execute(Item.__table__.insert(), items)
+        if bids:
+            database.session.execute(Bid.__table__.insert(), bids)
+
+    database.session.commit()
+
+
+def prepare(args):
+    path = os.path.join(args.data, f'{args.scale}-{args.seed}.db')
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + path
+
+    if args.reseed or not os.path.exists(path):
+        os.makedirs(args.data, exist_ok=True)
+        started = time.perf_counter()
+
+        with app.app_context():
+            seed(args.scale, random.Random(args.seed))
+            database.engine.dispose()
+
+        print(f'Seeded {path} in {time.perf_counter() - started:.1f}s', file=sys.stderr)
+
+    return path
+
+#================================================================
+# Clients
+
+class InProcessClient():
+    # Flask test client, SQL statements are counted on the engine
+
+    def __init__(self):
+        self.client = app.test_client()
+
+
+    def request(self, method, path, data=None):
+        response = self.client.open(path, method=method, data=data)
+        return response.status_code, response.get_data(as_text=True)
+
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+
+    def redirect_request(self, *args):
+        return None
+
+
+class HttpClient():
+    # Cookie keeping HTTP client of one user, redirects are returned, not followed
+
+    def __init__(self, url):
+        self.url = url
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(CookieJar()), NoRedirect())
+
+
+    def request(self, method, path, data=None):
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+
+        try:
+            with self.opener.open(urllib.request.Request(self.url + path, body, method=method)) as response:
+                return response.status, response.read().decode()
+        except urllib.error.HTTPError as error:
+            return error.code, error.read().decode()
+
+
+def csrf_token(client):
+    status, body = client.request('GET', '/login')
+    match = re.search(r'name="csrf_token" type="hidden" value="([^"]+)"', body)
+    return match.group(1) if match else None
+
+
+def log_in(client, nick):
+    token = csrf_token(client)
+    status, _ = client.request('POST', '/login', {'nick': nick, 'password': PASSWORD, 'csrf_token': token})
+    assert status == 303, f'Login of {nick} failed with {status}'
+    return token
+
+#================================================================
+# Scenarios - each request returns the status it expects
+
+class Scenarios():
+
+    def __init__(self, args):
+        sizes = SCALES[args.scale]
+        self.item_count = sizes['items']
+        self.user_count = sizes['users']
+        self.rng = random.Random(args.seed)
+        self.lock = threading.Lock()
+        self.prices = itertools.count(10000)
+
+
+    def random_item(self):
+        with self.lock:
+            return self.rng.randrange(1, self.item_count + 1)
+
+
+    def random_user(self):
+        with self.lock:
+            return f'user{self.rng.randrange(self.user_count)}'
+
+
+    def home(self, client, state):
+        return client.request('GET', '/home')[0] == 200
+
+
+    def items(self, client, state):
+        return client.request('GET', '/items')[0] == 200
+
+
+    def items_by_price(self, client, state):
+        return client.request('GET', '/items?sort=-current_price')[0] == 200
+
+
+    def users_page(self, client, state):
+        return client.request('GET', '/users')[0] == 200
+
+
+    def item(self, client, state):
+        return client.request('GET', f'/item/{self.random_item()}')[0] == 200
+
+
+    def login(self, client, state):
+        if 'token' not in state:
+            state['token'] = csrf_token(client)
+
+        data = {'nick': self.random_user(), 'password': PASSWORD, 'csrf_token': state['token']}
+        return client.request('POST', '/login', data)[0] == 303
+
+
+    def bid(self, client, state):
+        # Every client bids as its own user on the same ten lots, so bids contend for rows
+        if 'token' not in state:
+            state['token'] = log_in(client, self.random_user())
+
+        with self.lock:
+            item_id = self.rng.randrange(1, 11)
+
+        data = {'new_price': next(self.prices), 'csrf_token': state['token']}
+        return client.request('POST', f'/item/{item_id}', data)[0] == 303
+
+
+    def all(self):
+        return {
+            'home': self.home,
+            'items': self.items,
+            'items?sort=-current_price': self.items_by_price,
+            'users': self.users_page,
+            'item/<id>': self.item,
+            'login': self.login,
+            'bid': self.bid,
+        }
+
+#================================================================
+# Measuring
+
+class QueryCounter():
+
+    def __init__(self):
+        self.count = 0
+        self.lock = threading.Lock()
+
+
+    def increase(self, *args):
+        with self.lock:
+            self.count += 1
+
+
+def percentile(latencies, fraction):
+    return latencies[min(int(len(latencies) * fraction), len(latencies) - 1)]
+
+
+def measure(scenario, clients, args):
+    def work(client):
+        state = dict()
+        latencies = list()
+
+        for _ in range(args.warmup):
+            scenario(client, state)
+
+        for _ in range(args.requests // len(clients)):
+            started = time.perf_counter()
+            ok = scenario(client, state)
+            latencies.append(time.perf_counter() - started)
+            assert ok, f'{scenario.__name__} got an unexpected status'
+
+        return latencies
+
+    counter = QueryCounter()
+    started = time.perf_counter()
+
+    if args.mode == 'inprocess':
+        with app.app_context():
+            event.listen(database.engine, 'before_cursor_execute', counter.increase)
+
+    try:
+        with ThreadPoolExecutor(len(clients)) as pool:
+            latencies = sorted(sum(pool.map(work, clients), []))
+    finally:
+        if args.mode == 'inprocess':
+            with app.app_context():
+                event.remove(database.engine, 'before_cursor_execute', counter.increase)
+
+    elapsed = time.perf_counter() - started
+    requests = len(latencies) + args.warmup * len(clients)
+
+    return {
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'requests_per_s': round(len(latencies) / elapsed, 1),
+        # Not visible from outside the gunicorn workers
+        'queries': round(counter.count / requests, 1) if args.mode == 'inprocess' else None,
+    }
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(args, path):
+    port = free_port()
+    env = dict(os.environ,
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + path,
+        SECRET_KEY = os.environ.get('SECRET_KEY') or 'benchmark',
+        CACHE_TYPE = 'memory' if args.cache else 'null'
+    )
+    server = subprocess.Popen([
+        # gunicorn 20.0 has no __main__
+        sys.executable, '-c', 'from gunicorn.app.wsgiapp import run; run()', '--workers', str(args.workers), '--bind', f'127.0.0.1:{port}',
+        '--log-level', 'warning', 'auction_site:app'
+    ], env=env)
+    url = f'http://127.0.0.1:{port}'
+
+    for _ in range(100):
+        try:
+            urllib.request.urlopen(url + '/home').close()
+            return server, url
+        except OSError:
+            time.sleep(0.1)
+
+    server.terminate()
+    raise RuntimeError('gunicorn did not start')
+
+
+def run(args):
+    path = prepare(args)
+    scenarios = Scenarios(args).all()
+    server = None
+
+    if args.mode == 'inprocess':
+        app.config['WTF_CSRF_ENABLED'] = False
+        if not args.cache:
+            cache.backend = NullBackend()
+        clients = [InProcessClient() for _ in range(args.clients)]
+    else:
+        server, url = start_server(args, path)
+        clients = [HttpClient(url) for _ in range(args.clients)]
+
+    try:
+        return {
+            name: measure(scenario, clients, args)
+            for name, scenario in scenarios.items()
+            if not args.only or name in args.only
+        }
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+#================================================================
+# Baselines
+
+def baseline_path(args):
+    return args.baseline or os.path.join(BENCHMARKS_DIR, 'baselines', f'{args.scale}-{args.mode}.json')
+
+
+def save(results, args):
+    path = baseline_path(args)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    with open(path, 'w') as baseline:
+        json.dump({
+            'scale': args.scale,
+            'mode': args.mode,
+            'clients': args.clients,
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'created': datetime.utcnow().isoformat(timespec='seconds'),
+            'results': results,
+        }, baseline, indent=2)
+
+    print(f'Baseline written to {path}', file=sys.stderr)
+
+
+def regressions(results, baseline, threshold, slack_ms):
+    """Pages whose p95 grew by more than `threshold` (and more than `slack_ms`) or that run more queries."""
+
+    found = list()
+
+    for name, result in results.items():
+        before = baseline.get(name)
+
+        if before is None:
+            continue
+
+        limit = max(before['p95_ms'] * (1 + threshold), before['p95_ms'] + slack_ms)
+        if result['p95_ms'] > limit:
+            found.append(f"{name}: p95 {result['p95_ms']} ms, baseline {before['p95_ms']} ms")
+
+        if result['queries'] is not None and before['queries'] is not None and result['queries'] > before['queries']:
+            found.append(f"{name}: {result['queries']} queries per request, baseline {before['queries']}")
+
+    return found
+
+
+def report(results, baseline):
+    columns = ('p50_ms', 'p95_ms', 'p99_ms', 'requests_per_s', 'queries')
+    print(f"{'':28}" + ''.join(f'{column:>16}' for column in columns))
+
+    for name, result in results.items():
+        cells = list()
+
+        for column in columns:
+            value = result[column]
+            cell = '-' if value is None else f'{value:.1f}'
+
+            if baseline.get(name, {}).get(column) is not None and value is not None:
+                cell += f' ({baseline[name][column]:.1f})'
+
+            cells.append(f'{cell:>16}')
+
+        print(f'{name:28}' + ''.join(cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', choices=SCALES, default='1k')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--mode', choices=('inprocess', 'server'), default='inprocess')
+    parser.add_argument('--workers', type=int, default=2, help="gunicorn workers in server mode.")
+    parser.add_argument('--clients', type=int, default=2, help="Concurrent clients per page.")
+    parser.add_argument('--requests', type=int, default=200, help="Measured requests per page.")
+    parser.add_argument('--warmup', type=int, default=5, help="Unmeasured requests per client before measuring.")
+    parser.add_argument('--only', nargs='*', help="Pages to run, all by default.")
+    parser.add_argument('--cache', action='store_true', help="Keep the response cache on, off by default.")
+    parser.add_argument('--data', default=os.path.join(BENCHMARKS_DIR, 'data'), help="Directory of seeded databases.")
+    parser.add_argument('--reseed', action='store_true')
+    parser.add_argument('--baseline', help="Baseline file, benchmarks/baselines/<scale>-<mode>.json by default.")
+    parser.add_argument('--save', action='store_true', help="Store the results as the baseline.")
+    parser.add_argument('--check', action='store_true', help="Exit 1 on a regression against the baseline.")
+    parser.add_argument('--threshold', type=float, default=0.2, help="Allowed p95 growth, 0.2 is 20%%.")
+    parser.add_argument('--slack', type=float, default=2.0, help="p95 growth in ms that never counts as a regression.")
+    args = parser.parse_args()
+
+    results = run(args)
+    baseline = dict()
+
+    if os.path.exists(baseline_path(args)):
+        with open(baseline_path(args)) as source:
+            baseline = json.load(source)['results']
+
+    report(results, baseline)
+
+    if args.save:
+        save(results, args)
+
+    if args.check:
+        if not baseline:
+            sys.exit(f'No baseline at {baseline_path(args)}, run with --save first')
+
+        found = regressions(results, baseline, args.threshold, args.slack)
+
+        if found:
+            print('Regressions:', *found, sep='\n  ', file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
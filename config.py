@@ -10,6 +10,87 @@ class Config():
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SECRET_KEY = os.environ.get('SECRET_KEY') or None
 
+    # Connection pool of server databases (Postgres, MySQL), SQLite opens a connection per checkout
+    DATABASE_POOL_SIZE = int(os.environ.get('DATABASE_POOL_SIZE') or 5)
+    DATABASE_MAX_OVERFLOW = int(os.environ.get('DATABASE_MAX_OVERFLOW') or 10)
+    DATABASE_POOL_TIMEOUT = int(os.environ.get('DATABASE_POOL_TIMEOUT') or 30)
+    DATABASE_POOL_RECYCLE = int(os.environ.get('DATABASE_POOL_RECYCLE') or 1800)
+    DATABASE_POOL_PRE_PING = (os.environ.get('DATABASE_POOL_PRE_PING') or '1') != '0'
+
+    # Read-only replica for GET requests, a user's own writes are read from the primary for DATABASE_REPLICA_LAG seconds
+    SQLALCHEMY_BINDS = {'replica': os.environ['DATABASE_REPLICA_URI']} if os.environ.get('DATABASE_REPLICA_URI') else None
+    DATABASE_REPLICA_LAG = int(os.environ.get('DATABASE_REPLICA_LAG') or 5)
+
+    # PRAGMAs run on every SQLite connection - WAL lets readers go on while a bid is written
+    SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE') or 'wal'
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS') or 'normal'
+    SQLITE_BUSY_TIMEOUT = int(os.environ.get('SQLITE_BUSY_TIMEOUT') or 5000)
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE') or 256 * 1024 * 1024)
+
+    # Auction times are stored in UTC and shown/entered in this zone
+    TIMEZONE = os.environ.get('TIMEZONE') or 'Europe/Warsaw'
+    HOME_ENDING_SOON = int(os.environ.get('HOME_ENDING_SOON') or 3)
+
+    # 'joined' or 'selectin' - how owner/winner are loaded with items
+    ITEM_USERS_LOADING = os.environ.get('ITEM_USERS_LOADING') or 'joined'
+
+    PAGE_SIZE = int(os.environ.get('PAGE_SIZE') or 24)
+    MAX_PAGE_SIZE = int(os.environ.get('MAX_PAGE_SIZE') or 100)
+
+    # 'memory' (per worker), 'redis' (shared, needs the redis package) or 'null'
+    CACHE_TYPE = os.environ.get('CACHE_TYPE') or 'memory'
+    CACHE_DEFAULT_TTL = int(os.environ.get('CACHE_DEFAULT_TTL') or 30)
+    CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES') or 1024)
+    CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL') or 'redis://localhost:6379/0'
+    # Redis generation counters expire after this long without an invalidation
+    CACHE_COUNTER_TTL = int(os.environ.get('CACHE_COUNTER_TTL') or 3600)
+
+    # Compiled templates are kept on disk for new workers, in a per-user temp directory unless a dir is given
+    JINJA_BYTECODE_CACHE = (os.environ.get('JINJA_BYTECODE_CACHE') or '1') != '0'
+    JINJA_BYTECODE_CACHE_DIR = os.environ.get('JINJA_BYTECODE_CACHE_DIR') or None
+    # Rendered item cards per worker, keyed by item id and version - 0 turns the fragment cache off
+    FRAGMENT_CACHE_SIZE = int(os.environ.get('FRAGMENT_CACHE_SIZE') or 4096)
+    FRAGMENT_CACHE_TTL = int(os.environ.get('FRAGMENT_CACHE_TTL') or 600)
+
+    # JSON API responses smaller than this are sent uncompressed
+    API_COMPRESS_MIN_SIZE = int(os.environ.get('API_COMPRESS_MIN_SIZE') or 512)
+    API_COMPRESS_LEVEL = int(os.environ.get('API_COMPRESS_LEVEL') or 6)
+
+    # 'pbkdf2:sha256:<iterations>' or 'scrypt:<n>:<r>:<p>', older hashes are upgraded on login
+    PASSWORD_METHOD = os.environ.get('PASSWORD_METHOD') or 'pbkdf2:sha256:260000'
+    PASSWORD_SALT_LENGTH = int(os.environ.get('PASSWORD_SALT_LENGTH') or 16)
+    # Hashing runs in a thread pool of this size, a verification taking longer than the timeout fails
+    PASSWORD_WORKERS = int(os.environ.get('PASSWORD_WORKERS') or 4)
+    PASSWORD_VERIFY_TIMEOUT = int(os.environ.get('PASSWORD_VERIFY_TIMEOUT') or 5)
+
+    # id/nick/admin of a logged in user are kept this long without asking the database.
+    # A change invalidates only the worker's own memory cache, other workers keep the old
+    # copy until it expires - so without redis the shorter USER_CACHE_LOCAL_TTL applies, 0 turns it off.
+    USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL') or 60)
+    USER_CACHE_LOCAL_TTL = int(os.environ.get('USER_CACHE_LOCAL_TTL') or 3)
+
+    # Bulk import (flask items import, /items/import) inserts and commits this many rows at once
+    IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE') or 1000)
+    IMPORT_MAX_ERRORS = int(os.environ.get('IMPORT_MAX_ERRORS') or 100)
+    # Export (flask items export, /items/export) fetches this many rows per round trip
+    EXPORT_CHUNK_SIZE = int(os.environ.get('EXPORT_CHUNK_SIZE') or 1000)
+
+    # Per endpoint histograms on /metrics, readable by admins or with "Authorization: Bearer <METRICS_TOKEN>"
+    METRICS_ENABLED = (os.environ.get('METRICS_ENABLED') or '1') != '0'
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN') or None
+    # A request over either budget is logged with its most repeated statement, 0 turns the check off
+    METRICS_QUERY_BUDGET = int(os.environ.get('METRICS_QUERY_BUDGET') or 0)
+    METRICS_LATENCY_BUDGET = int(os.environ.get('METRICS_LATENCY_BUDGET') or 0)
+
+    # Logins, logouts and last seen times are buffered and written at most this often (seconds)
+    PRESENCE_FLUSH_INTERVAL = int(os.environ.get('PRESENCE_FLUSH_INTERVAL') or 10)
+
+    # 'local' (per worker) or 'redis' (across workers, needs the redis package)
+    EVENTS_TYPE = os.environ.get('EVENTS_TYPE') or 'local'
+    EVENTS_REDIS_URL = os.environ.get('EVENTS_REDIS_URL') or 'redis://localhost:6379/0'
+    EVENTS_HEARTBEAT = int(os.environ.get('EVENTS_HEARTBEAT') or 15)
+    EVENTS_QUEUE_SIZE = int(os.environ.get('EVENTS_QUEUE_SIZE') or 16)
+
 
 class AdminModelView(ModelView):
 
@@ -33,6 +33,18 @@ target_metadata = current_app.extensions['migrate'].db.metadata
 # ... etc.
 
 
+# Expression indexes do not survive reflection, autogenerate would report them as new every time
+EXPRESSION_INDEXES = {'ix_item_status_current_price', 'ix_item_status_asking_price'}
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    # The full-text index (FTS5 table and its shadow tables) is managed by hand
+    if type_ == 'table' and reflected and compare_to is None and name.startswith('item_search'):
+        return False
+
+    return not (type_ == 'index' and name in EXPRESSION_INDEXES)
+
+
 def run_migrations_offline():
     """Run migrations in 'offline' mode.
 
@@ -47,7 +59,8 @@ def run_migrations_offline():
     """
     url = config.get_main_option("sqlalchemy.url")
     context.configure(
-        url=url, target_metadata=target_metadata, literal_binds=True
+        url=url, target_metadata=target_metadata, literal_binds=True,
+        include_object=include_object
     )
 
     with context.begin_transaction():
@@ -83,6 +96,7 @@ def run_migrations_online():
             connection=connection,
             target_metadata=target_metadata,
             process_revision_directives=process_revision_directives,
+            include_object=include_object,
             **current_app.extensions['migrate'].configure_args
         )
 
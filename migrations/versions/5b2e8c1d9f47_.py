@@ -0,0 +1,76 @@
+"""item start/end dates become UTC timestamps
+
+Revision ID: 5b2e8c1d9f47
+Revises: 371cac612e24
+Create Date: 2026-10-18 11:02:14.318402
+
+"""
+from datetime import date, datetime, time, timedelta
+from alembic import op
+import sqlalchemy as sa
+import pytz
+from flask import current_app
+
+
+# revision identifiers, used by Alembic.
+revision = '5b2e8c1d9f47'
+down_revision = '371cac612e24'
+branch_labels = None
+depends_on = None
+
+
+def local_midnight_utc(day, zone):
+    return zone.localize(datetime.combine(day, time())).astimezone(pytz.utc).replace(tzinfo=None)
+
+
+def upgrade():
+    connection = op.get_bind()
+    zone = pytz.timezone(current_app.config.get('TIMEZONE', 'UTC'))
+
+    # SQLite keeps whatever is written regardless of the declared type, and a batch copy would
+    # CAST the text dates into numbers - there only the values are rewritten
+    if connection.dialect.name != 'sqlite':
+        op.alter_column('item', 'start_date', existing_type=sa.Date(), type_=sa.DateTime(), existing_nullable=False,
+            postgresql_using='start_date::timestamp')
+        op.alter_column('item', 'end_date', existing_type=sa.Date(), type_=sa.DateTime(), existing_nullable=False,
+            postgresql_using='end_date::timestamp')
+
+    # An auction used to run from 00:00 of its start day until the end of its end day (local time).
+    # Rows are rewritten per distinct day, latest first so a shifted end never meets an unshifted one.
+    for column, shift in (('start_date', 0), ('end_date', 1)):
+        days = [row[0] for row in connection.execute(sa.text(
+            f"SELECT DISTINCT {column} FROM item ORDER BY {column} DESC"
+        ))]
+
+        for raw in days:
+            day = date.fromisoformat(str(raw)[:10])
+            connection.execute(
+                sa.text(f"UPDATE item SET {column} = :new WHERE {column} = :old").bindparams(
+                    sa.bindparam('new', type_=sa.DateTime())),
+                new=local_midnight_utc(day + timedelta(shift), zone), old=raw
+            )
+
+
+def downgrade():
+    connection = op.get_bind()
+    zone = pytz.timezone(current_app.config.get('TIMEZONE', 'UTC'))
+
+    for column, shift in (('start_date', 0), ('end_date', -1)):
+        moments = [row[0] for row in connection.execute(sa.text(
+            f"SELECT DISTINCT {column} FROM item ORDER BY {column}"
+        ))]
+
+        for raw in moments:
+            moment = raw if isinstance(raw, datetime) else datetime.fromisoformat(str(raw))
+            day = pytz.utc.localize(moment).astimezone(zone).date() + timedelta(shift)
+            connection.execute(
+                sa.text(f"UPDATE item SET {column} = :new WHERE {column} = :old").bindparams(
+                    sa.bindparam('new', type_=sa.Date())),
+                new=day, old=raw
+            )
+
+    if connection.dialect.name != 'sqlite':
+        op.alter_column('item', 'start_date', existing_type=sa.DateTime(), type_=sa.Date(), existing_nullable=False,
+            postgresql_using='start_date::date')
+        op.alter_column('item', 'end_date', existing_type=sa.DateTime(), type_=sa.Date(), existing_nullable=False,
+            postgresql_using='end_date::date')
@@ -0,0 +1,56 @@
+"""full-text index over item name and description
+
+Revision ID: 8c4f1a2e6d93
+Revises: 5b2e8c1d9f47
+Create Date: 2026-10-18 13:41:52.604117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c4f1a2e6d93'
+down_revision = '5b2e8c1d9f47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    connection = op.get_bind()
+
+    if connection.dialect.name == 'sqlite':
+        op.execute("""CREATE VIRTUAL TABLE item_search USING fts5(
+            name, description, content='item', content_rowid='id', prefix='2 3')""")
+        op.execute("""CREATE TRIGGER item_search_insert AFTER INSERT ON item BEGIN
+            INSERT INTO item_search(rowid, name, description) VALUES (new.id, new.name, new.description);
+        END""")
+        op.execute("""CREATE TRIGGER item_search_delete AFTER DELETE ON item BEGIN
+            INSERT INTO item_search(item_search, rowid, name, description) VALUES ('delete', old.id, old.name, old.description);
+        END""")
+        op.execute("""CREATE TRIGGER item_search_update AFTER UPDATE OF name, description ON item BEGIN
+            INSERT INTO item_search(item_search, rowid, name, description) VALUES ('delete', old.id, old.name, old.description);
+            INSERT INTO item_search(rowid, name, description) VALUES (new.id, new.name, new.description);
+        END""")
+        # Index the items that already exist
+        op.execute("INSERT INTO item_search(item_search) VALUES ('rebuild')")
+
+    elif connection.dialect.name == 'postgresql':
+        op.execute("""ALTER TABLE item ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+            setweight(to_tsvector('simple', coalesce(name, '')), 'A') ||
+            setweight(to_tsvector('simple', coalesce(description, '')), 'B')) STORED""")
+        op.execute("CREATE INDEX ix_item_search_vector ON item USING gin (search_vector)")
+
+
+def downgrade():
+    connection = op.get_bind()
+
+    if connection.dialect.name == 'sqlite':
+        op.execute("DROP TRIGGER IF EXISTS item_search_update")
+        op.execute("DROP TRIGGER IF EXISTS item_search_delete")
+        op.execute("DROP TRIGGER IF EXISTS item_search_insert")
+        op.execute("DROP TABLE IF EXISTS item_search")
+
+    elif connection.dialect.name == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_item_search_vector")
+        op.execute("ALTER TABLE item DROP COLUMN IF EXISTS search_vector")
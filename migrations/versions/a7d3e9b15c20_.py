@@ -0,0 +1,28 @@
+"""price indexes for sorted and filtered listings
+
+Revision ID: a7d3e9b15c20
+Revises: 8c4f1a2e6d93
+Create Date: 2026-10-18 15:12:07.913356
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7d3e9b15c20'
+down_revision = '8c4f1a2e6d93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_item_status_current_price', 'item',
+        ['status', sa.text('coalesce(current_price, asking_price, 0)'), 'id'], unique=False)
+    op.create_index('ix_item_status_asking_price', 'item',
+        ['status', sa.text('coalesce(asking_price, 0)'), 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_item_status_asking_price', table_name='item')
+    op.drop_index('ix_item_status_current_price', table_name='item')
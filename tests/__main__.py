@@ -1,5 +1,20 @@
 import unittest
 
 from .test_routes import TestRoutes
+from .test_bidding import TestBidding
+from .test_cache import TestCache
+from .test_api import TestApi
+from .test_events import TestEvents
+from .test_closing import TestClosing
+from .test_search import TestSearch
+from .test_engine import TestEngine
+from .test_replica import TestReplica
+from .test_principal import TestPrincipal
+from .test_presence import TestPresence
+from .test_passwords import TestPasswords
+from .test_metrics import TestMetrics
+from .test_importing import TestImporting
+from .test_exporting import TestExporting
+from .test_fragments import TestFragments
 
 unittest.main()
\ No newline at end of file
@@ -0,0 +1,136 @@
+import gzip
+import json
+from datetime import date, datetime, timedelta
+from flask_testing import TestCase
+from werkzeug.security import generate_password_hash
+
+from . import app, database, User, Item
+from auction_site.cache import cache
+from auction_site.bidding import place_bid
+
+#================================================================
+
+class TestApi(TestCase):
+
+    def create_app(self):
+        app.config['TESTING'] = True
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        app.config['WTF_CSRF_ENABLED'] = False
+        app.config['LOGIN_DISABLED'] = True
+        return app
+
+
+    def setUp(self):
+        cache.clear()
+        database.create_all()
+
+        database.session.add(User(
+            nick = 'Tester',
+            password = generate_password_hash('testPassword', 'sha256'),
+            register_date = date.today(),
+            admin = True,
+            active = False
+        ))
+
+        for i in range(30):
+            database.session.add(Item(
+                name = f'Item{i}',
+                description = 'Test item ' * 10,
+                asking_price = 1.0,
+                current_price = 1.0,
+                start_date = datetime.utcnow() - timedelta(hours=1),
+                end_date = datetime.utcnow() + timedelta(i % 4, hours=1),
+                owner_id = 1
+            ))
+        database.session.commit()
+
+
+    def tearDown(self):
+        database.session.remove()
+        database.drop_all()
+
+#================================================================
+
+    # Page through active items
+    def test_items_get(self):
+        response = self.client.get("/api/v1/items?size=20")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json['items']), 20)
+        self.assertEqual(response.json['items'][0]['owner'], 'Tester')
+
+        response = self.client.get(response.json['next'])
+        self.assertEqual(len(response.json['items']), 10)
+        self.assertIsNone(response.json['next'])
+
+
+    # Sorted by price with ties and NULL prices, filtered by range, paged without gaps
+    def test_items_get_sorted_filtered(self):
+        for i, item in enumerate(Item.query.order_by(Item.id)):
+            item.current_price = None if i % 5 == 0 else float(i % 7 * 20)
+        database.session.commit()
+
+        prices = list()
+        url = "/api/v1/items?sort=-current_price&min_price=20&max_price=100&size=4"
+
+        while url:
+            response = self.client.get(url).json
+            prices += [item['current_price'] for item in response['items']]
+            url = response['next']
+
+        expected = sorted([p for p in (None if i % 5 == 0 else float(i % 7 * 20) for i in range(30))
+            if p is not None and 20 <= p < 100], reverse=True)
+        self.assertEqual(prices, expected)
+
+        names = [item['name'] for item in self.client.get("/api/v1/items?sort=current_price&size=30").json['items']]
+        self.assertEqual(len(set(names)), 30)
+        self.assertEqual(self.client.get("/api/v1/items?seller=2").json['items'], [])
+
+
+    # Facet counts come from one cached aggregate
+    def test_items_facets(self):
+        Item.query.filter(Item.id <= 10).update({Item.current_price: 75.0})
+        database.session.commit()
+
+        facets = self.client.get("/api/v1/items/facets").json
+        self.assertEqual([bucket['count'] for bucket in facets['price']], [20, 10, 0, 0])
+        self.assertTrue(0 < facets['ending']['today'] <= facets['ending']['week'] <= 30)
+
+        Item.query.update({Item.current_price: 700.0})
+        database.session.commit()
+        self.assertEqual(self.client.get("/api/v1/items/facets").json, facets)
+
+        cache.invalidate('listings')
+        self.assertEqual(self.client.get("/api/v1/items/facets").json['price'][3]['count'], 30)
+
+
+    # Sparse fieldsets
+    def test_items_get_fields(self):
+        response = self.client.get("/api/v1/items?fields=id,current_price")
+        self.assertEqual(set(response.json['items'][0]), {'id', 'current_price'})
+
+
+    # Bids and users
+    def test_bids_and_users_get(self):
+        item_id = Item.query.first().id
+        place_bid(item_id, 1, 5.0)
+
+        response = self.client.get(f"/api/v1/items/{item_id}/bids")
+        self.assertEqual([(b['user'], b['amount']) for b in response.json['items']], [('Tester', 5.0)])
+
+        response = self.client.get(f"/api/v1/items/{item_id}")
+        self.assertEqual(response.json['winner'], 'Tester')
+        self.assertEqual(self.client.get("/api/v1/items/0").status_code, 404)
+
+        response = self.client.get("/api/v1/users")
+        self.assertEqual(response.json['items'][0]['items_count'], 30)
+        self.assertNotIn('password', response.json['items'][0])
+
+
+    # Large answers are gzipped for clients that accept it
+    def test_items_get_compressed(self):
+        response = self.client.get("/api/v1/items", headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(len(json.loads(gzip.decompress(response.data))['items']), app.config['PAGE_SIZE'])
+
+        response = self.client.get("/api/v1/items")
+        self.assertNotIn('Content-Encoding', response.headers)
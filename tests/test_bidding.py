@@ -0,0 +1,113 @@
+import os
+import tempfile
+from datetime import date, datetime, timedelta
+from random import shuffle
+from concurrent.futures import ThreadPoolExecutor
+from flask_testing import TestCase
+from werkzeug.security import generate_password_hash
+
+from . import app, database, User, Item
+from auction_site.cache import cache
+from auction_site.models import Bid
+from auction_site.bidding import place_bid, item_bids, BidResult, BID_ORDER
+
+#================================================================
+
+class TestBidding(TestCase):
+
+    def create_app(self):
+        self.database_file = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+        self.database_file.close()
+
+        app.config['TESTING'] = True
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + self.database_file.name
+        app.config['WTF_CSRF_ENABLED'] = False
+        app.config['LOGIN_DISABLED'] = True
+        return app
+
+
+    def setUp(self):
+        cache.clear()
+        database.create_all()
+
+        for i in range(10):
+            database.session.add(User(
+                nick = f'Bidder{i}',
+                password = generate_password_hash('testPassword', 'sha256'),
+                register_date = date.today(),
+                admin = False,
+                active = False
+            ))
+
+        database.session.add(Item(
+            name = 'Item',
+            asking_price = 1.0,
+            current_price = 1.0,
+            start_date = datetime.utcnow() - timedelta(hours=1),
+            end_date = datetime.utcnow() + timedelta(hours=1),
+            owner_id = 1
+        ))
+        database.session.commit()
+        self.item_id = Item.query.first().id
+
+
+    def tearDown(self):
+        database.session.remove()
+        database.drop_all()
+        database.get_engine(app).dispose()
+        os.unlink(self.database_file.name)
+
+
+    def bid(self, bid):
+        with app.app_context():
+            try:
+                return place_bid(self.item_id, *bid)
+            finally:
+                database.session.remove()
+
+#================================================================
+
+    # Accepted, outbid and closed bids
+    def test_place_bid_results(self):
+        self.assertEqual(place_bid(self.item_id, 1, 5.0), BidResult.ACCEPTED)
+        self.assertEqual(place_bid(self.item_id, 2, 5.0), BidResult.OUTBID)
+        self.assertEqual(place_bid(self.item_id + 1, 2, 5.0), BidResult.NOT_FOUND)
+
+        Item.query.update({'end_date': datetime.utcnow() - timedelta(1)})
+        database.session.commit()
+        self.assertEqual(place_bid(self.item_id, 2, 10.0), BidResult.CLOSED)
+
+        item = Item.query.get(self.item_id)
+        self.assertEqual((item.current_price, item.winner_id), (5.0, 1))
+
+
+    # Thousands of concurrent bids, the highest one has to win
+    def test_place_bid_concurrent(self):
+        bids = [(i % 10 + 1, float(i)) for i in range(2, 2002)]
+        shuffle(bids)
+
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            results = list(executor.map(self.bid, bids))
+
+        database.session.expire_all()
+        item = Item.query.get(self.item_id)
+        best = max(bids, key=lambda bid: bid[1])
+
+        self.assertEqual(item.current_price, best[1])
+        self.assertEqual(item.winner_id, best[0])
+        self.assertIn(BidResult.ACCEPTED, results)
+        self.assertNotIn(BidResult.CLOSED, results)
+        self.assertEqual(Bid.query.count(), results.count(BidResult.ACCEPTED))
+
+
+    # Only accepted bids land in the history, highest first
+    def test_place_bid_history(self):
+        for user_id, amount in ((1, 2.0), (2, 1.5), (3, 3.0)):
+            place_bid(self.item_id, user_id, amount)
+
+        bids = item_bids(self.item_id).order_by(*[column.desc() for column, _ in BID_ORDER]).all()
+        self.assertEqual([(b.user_id, b.amount) for b in bids], [(3, 3.0), (1, 2.0)])
+
+        response = self.client.get(f"/item/{self.item_id}")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'Bidder2', response.data)
@@ -0,0 +1,206 @@
+import fnmatch
+import re
+from datetime import date, datetime, timedelta
+from unittest.mock import patch
+from flask_testing import TestCase
+from werkzeug.security import generate_password_hash
+
+from . import app, database, User, Item
+from . import AddItemForm
+from auction_site.bidding import place_bid, BidResult
+from auction_site.cache import cache, MemoryBackend, RedisBackend
+from .test_routes import QueryCounter
+
+
+class FakeRedis():
+
+    def __init__(self):
+        self.data = dict()
+        self.expiry = dict()
+
+
+    def get(self, key):
+        return self.data.get(key)
+
+
+    def set(self, key, value, ex=None, nx=False):
+        if not (nx and key in self.data):
+            self.data[key] = str(value).encode() if isinstance(value, int) else value
+            self.expiry[key] = ex
+
+
+    def expire(self, key, seconds):
+        self.expiry[key] = seconds
+
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+
+    def incr(self, key):
+        self.data[key] = str(int(self.data.get(key, 0)) + 1).encode()
+        return int(self.data[key])
+
+
+    def scan_iter(self, match='*'):
+        return [key for key in list(self.data) if fnmatch.fnmatch(key, match)]
+
+#================================================================
+
+class TestCache(TestCase):
+
+    def create_app(self):
+        app.config['TESTING'] = True
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        app.config['WTF_CSRF_ENABLED'] = False
+        app.config['LOGIN_DISABLED'] = True
+        return app
+
+
+    def setUp(self):
+        self.backend = cache.backend
+        cache.clear()
+        database.create_all()
+
+        database.session.add(User(
+            nick = 'Tester',
+            password = generate_password_hash('testPassword', 'sha256'),
+            register_date = date.today(),
+            admin = True,
+            active = False
+        ))
+        database.session.add(Item(
+            name = 'Item',
+            start_date = datetime.utcnow() - timedelta(hours=1),
+            end_date = datetime.utcnow() + timedelta(hours=1),
+            current_price = 1.0,
+            owner_id = 1
+        ))
+        database.session.commit()
+
+
+    def tearDown(self):
+        cache.backend = self.backend
+        database.session.remove()
+        database.drop_all()
+
+#================================================================
+
+    # Least recently used entries go first, expired ones are dropped
+    def test_memory_backend(self):
+        backend = MemoryBackend(max_entries=2, default_ttl=10)
+        backend.set('a', 1)
+        backend.set('b', 2)
+        backend.get('a')
+        backend.set('c', 3)
+
+        self.assertEqual((backend.get('a'), backend.get('b'), backend.get('c')), (1, None, 3))
+
+        with patch('auction_site.cache.time.monotonic', return_value=10 ** 9):
+            self.assertIsNone(backend.get('a'))
+
+
+    # Generation counters are bounded, one dropped comes back at a value no entry was stored under
+    def test_counters_bounded(self):
+        backend = MemoryBackend(max_entries=2)
+        generation = backend.incr('a')
+
+        for key in ('b', 'c', 'd'):
+            backend.incr(key)
+
+        self.assertEqual(len(backend.counters), 2)
+        self.assertNotIn(backend.counter('a'), (0, generation))
+
+        redis = FakeRedis()
+        backend = RedisBackend(redis, counter_ttl=60)
+        self.assertEqual(backend.incr('a'), backend.counter('a'))
+        self.assertEqual(redis.expiry['auction_site:a'], 60)
+
+
+    # Listings are served from the cache until an item is added
+    def test_cached_listing(self):
+        for backend in (MemoryBackend(), RedisBackend(FakeRedis())):
+            cache.backend = backend
+            cache.clear()
+
+            self.assertEqual(self.client.get("/items").status_code, 200)
+
+            with QueryCounter() as counter:
+                response = self.client.get("/items")
+
+            self.assertEqual(response.status_code, 200)
+            # Only the ETag validator query runs
+            self.assertEqual(counter.count, 1)
+            # First render missed the page and the facet counts
+            self.assertEqual(cache.stats(), {'hits': 1, 'misses': 2})
+
+            form = AddItemForm()
+            form.name.default = 'NewItem'
+            form.process()
+
+            with patch('auction_site.routes.current_user') as mock_user:
+                mock_user.id = 1
+                self.client.post("/items/add", data=dict(form.data,
+                    start_date = form.start_date._value(),
+                    end_date = form.end_date._value()
+                ))
+
+            self.assertIn(b'NewItem', self.client.get("/items").data)
+            Item.query.filter_by(name='NewItem').delete()
+            database.session.commit()
+
+
+    # Two sessions of one user share the cached item page, each bids with its own CSRF token
+    def test_cached_page_csrf(self):
+        app.config['WTF_CSRF_ENABLED'] = True
+        app.config['LOGIN_DISABLED'] = False
+        database.session.add(User(
+            nick = 'Buyer',
+            password = generate_password_hash('testPassword', 'sha256'),
+            register_date = date.today()
+        ))
+        database.session.commit()
+
+        # Own app context per request like on a server, flask_wtf keeps the token in g
+        def send(client, method, url, **kwargs):
+            with app.app_context():
+                return getattr(client, method)(url, **kwargs)
+
+        token = lambda response: re.search(r'name="csrf_token" type="hidden" value="([^"]+)"', response.get_data(as_text=True)).group(1)
+        clients = [app.test_client(), app.test_client()]
+
+        try:
+            for client in clients:
+                send(client, 'post', '/login', data={'nick': 'Buyer', 'password': 'testPassword', 'csrf_token': token(send(client, 'get', '/login'))})
+
+            tokens = [token(send(client, 'get', '/item/1')) for client in clients]
+            self.assertNotEqual(*tokens)
+
+            for price, client, csrf_token in zip((2, 3), clients, tokens):
+                response = send(client, 'post', '/item/1', data={'new_price': price, 'csrf_token': csrf_token})
+                self.assertIn('bid=accepted', response.location)
+        finally:
+            app.config['WTF_CSRF_ENABLED'] = False
+            app.config['LOGIN_DISABLED'] = True
+
+        self.assertEqual(Item.query.get(1).current_price, 3.0)
+
+
+    # A change made by another worker skips this worker's invalidation, the version tag in the key still misses
+    def test_cached_page_versioned(self):
+        for path in ("/items", "/item/1"):
+            self.assertIn(b'1.0', self.client.get(path).data)
+
+        self.assertEqual(place_bid(1, 1, 7.5), BidResult.ACCEPTED)
+
+        for path in ("/items", "/item/1"):
+            response = self.client.get(path)
+            self.assertIn(b'7.5', response.data)
+
+            self.assertEqual(self.client.get(path, headers={'If-None-Match': response.headers['ETag']}).status_code, 304)
+
+        # The owner's nick is on the item page, renaming them needs no per-item invalidation either
+        User.query.get(1).nick = 'Renamed'
+        database.session.commit()
+        self.assertIn(b'Renamed', self.client.get("/item/1").data)
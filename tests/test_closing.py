@@ -0,0 +1,76 @@
+from datetime import date, datetime, timedelta
+from flask_testing import TestCase
+from werkzeug.security import generate_password_hash
+
+from . import app, database, User, Item
+from auction_site.models import Bid
+from auction_site.cache import cache
+from auction_site.events import events
+from auction_site.closing import close_auctions
+
+#================================================================
+
+class TestClosing(TestCase):
+
+    def create_app(self):
+        app.config['TESTING'] = True
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        app.config['WTF_CSRF_ENABLED'] = False
+        app.config['LOGIN_DISABLED'] = True
+        return app
+
+
+    def setUp(self):
+        cache.clear()
+        database.create_all()
+
+        for i in range(3):
+            database.session.add(User(
+                nick = f'Tester{i}',
+                password = generate_password_hash('testPassword', 'sha256'),
+                register_date = date.today()
+            ))
+
+        for i in range(25):
+            database.session.add(Item(
+                name = f'Item{i}',
+                current_price = 1.0,
+                start_date = datetime.utcnow() - timedelta(5),
+                end_date = datetime.utcnow() - timedelta(1) if i < 20 else datetime.utcnow() + timedelta(hours=1),
+                owner_id = 1
+            ))
+        database.session.commit()
+
+
+    def tearDown(self):
+        database.session.remove()
+        database.drop_all()
+
+#================================================================
+
+    # Expired lots are closed in batches and get the top bidder as winner
+    def test_close_auctions(self):
+        first = Item.query.first()
+        database.session.add(Bid(item_id=first.id, user_id=2, amount=5.0))
+        database.session.add(Bid(item_id=first.id, user_id=3, amount=7.0))
+        database.session.commit()
+
+        subscription = events.subscribe(f'item:{first.id}')
+        closed = close_auctions(batch_size=7)
+        message = subscription.get(0)
+        subscription.close()
+
+        database.session.expire_all()
+        self.assertEqual(closed, 20)
+        self.assertEqual(Item.query.filter_by(status=Item.CLOSED).count(), 20)
+        self.assertEqual(Item.query.filter_by(status=Item.OPEN).count(), 5)
+        self.assertEqual(Item.query.get(first.id).winner_id, 3)
+        self.assertEqual(message, {'type': 'closed', 'item_id': first.id})
+        self.assertEqual(close_auctions(), 0)
+
+
+    # Same through the flask CLI
+    def test_close_command(self):
+        result = app.test_cli_runner().invoke(args=['auctions', 'close'])
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn('Closed 20 auctions', result.output)
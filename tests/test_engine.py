@@ -0,0 +1,35 @@
+from flask_testing import TestCase
+from sqlalchemy.engine.url import make_url
+
+from . import app, database
+
+#================================================================
+
+class TestEngine(TestCase):
+
+    def create_app(self):
+        app.config['TESTING'] = True
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        return app
+
+#================================================================
+
+    # SQLite connections come with the configured pragmas
+    def test_sqlite_pragmas(self):
+        self.assertEqual(database.session.execute('PRAGMA busy_timeout').scalar(), app.config['SQLITE_BUSY_TIMEOUT'])
+        self.assertEqual(database.session.execute('PRAGMA synchronous').scalar(), 1)
+        database.session.remove()
+
+
+    # Server databases get the pool from the config, explicit engine options win
+    def test_pool_options(self):
+        options = dict()
+        database.apply_driver_hacks(app, make_url('postgresql://auction@localhost/auction'), options)
+        self.assertEqual(options['pool_size'], app.config['DATABASE_POOL_SIZE'])
+        self.assertEqual(options['max_overflow'], app.config['DATABASE_MAX_OVERFLOW'])
+        self.assertTrue(options['pool_pre_ping'])
+        self.assertNotIn('sqlite_pragmas', options)
+
+        options = {'pool_size': 50}
+        database.apply_driver_hacks(app, make_url('postgresql://auction@localhost/auction'), options)
+        self.assertEqual(options['pool_size'], 50)
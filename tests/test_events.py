@@ -0,0 +1,160 @@
+import fnmatch
+import json
+import queue
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from unittest.mock import patch
+from flask_testing import TestCase
+from werkzeug.security import generate_password_hash
+
+from . import app, database, User, Item
+from auction_site.cache import cache
+from auction_site.events import events, LocalPubSub, RedisPubSub
+
+
+class FakeRedis():
+
+    def __init__(self):
+        self.patterns = defaultdict(list)
+        self.connections = 0
+
+
+    def publish(self, channel, data):
+        for pattern, pubsubs in list(self.patterns.items()):
+            if fnmatch.fnmatch(channel, pattern):
+                for pubsub in pubsubs:
+                    pubsub.messages.put({'type': 'pmessage', 'pattern': pattern, 'channel': channel.encode(), 'data': data})
+
+
+    def pubsub(self, ignore_subscribe_messages=False):
+        self.connections += 1
+        return FakePubSub(self)
+
+
+class FakePubSub():
+
+    def __init__(self, redis):
+        self.redis = redis
+        self.messages = queue.Queue()
+
+
+    def psubscribe(self, pattern):
+        self.redis.patterns[pattern].append(self)
+
+
+    def get_message(self, ignore_subscribe_messages=False, timeout=0):
+        try:
+            return self.messages.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+    def close(self):
+        for pubsubs in self.redis.patterns.values():
+            if self in pubsubs:
+                pubsubs.remove(self)
+
+#================================================================
+
+class TestEvents(TestCase):
+
+    def create_app(self):
+        app.config['TESTING'] = True
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        app.config['WTF_CSRF_ENABLED'] = False
+        app.config['LOGIN_DISABLED'] = True
+        return app
+
+
+    def setUp(self):
+        cache.clear()
+        database.create_all()
+
+        database.session.add(User(
+            nick = 'Tester',
+            password = generate_password_hash('testPassword', 'sha256'),
+            register_date = date.today(),
+            admin = True,
+            active = False
+        ))
+        database.session.add(Item(
+            name = 'Item',
+            current_price = 1.0,
+            start_date = datetime.utcnow() - timedelta(hours=1),
+            end_date = datetime.utcnow() + timedelta(hours=1),
+            owner_id = 1
+        ))
+        database.session.commit()
+
+
+    def tearDown(self):
+        database.session.remove()
+        database.drop_all()
+
+#================================================================
+
+    # Every subscriber of a channel gets the message, slow ones keep the newest
+    def test_local_pubsub(self):
+        pubsub = LocalPubSub(queue_size=2)
+        first, second, other = pubsub.subscribe('a'), pubsub.subscribe('a'), pubsub.subscribe('b')
+
+        for i in range(3):
+            pubsub.publish('a', {'i': i})
+
+        self.assertEqual([first.get(0), first.get(0), first.get(0)], [{'i': 1}, {'i': 2}, None])
+        self.assertEqual(second.get(0), {'i': 1})
+        self.assertIsNone(other.get(0))
+
+        for subscription in (first, second, other):
+            subscription.close()
+
+        self.assertEqual(len(pubsub.subscriptions), 0)
+
+
+    # Same interface over a Redis-style client, one connection per worker whatever the number of streams
+    def test_redis_pubsub(self):
+        redis = FakeRedis()
+        pubsub = RedisPubSub(redis)
+        subscriptions = [pubsub.subscribe('item:1') for _ in range(100)]
+        other = pubsub.subscribe('item:2')
+
+        try:
+            # The listener subscribes in the background
+            while not redis.patterns:
+                time.sleep(0.01)
+
+            pubsub.publish('item:1', {'type': 'bid', 'current_price': 2.0})
+
+            for subscription in subscriptions:
+                self.assertEqual(subscription.get(1), {'type': 'bid', 'current_price': 2.0})
+
+            self.assertIsNone(other.get(0.1))
+            self.assertEqual(redis.connections, 1)
+        finally:
+            for subscription in subscriptions + [other]:
+                subscription.close()
+
+            pubsub.close()
+
+        self.assertEqual(len(pubsub.local.subscriptions), 0)
+
+
+    # Accepted bids are pushed to the item's stream
+    def test_bid_pushed_to_stream(self):
+        item_id = Item.query.first().id
+        stream = events.stream(f'item:{item_id}')
+        self.assertTrue(next(stream).startswith('retry:'))
+
+        with patch('auction_site.routes.current_user') as mock_user:
+            mock_user.id = 1
+            mock_user.nick = 'Tester'
+            self.client.post(f"/item/{item_id}", data={'new_price': 2.0})
+
+        chunk = next(stream)
+        stream.close()
+
+        self.assertTrue(chunk.startswith('event: bid\n'))
+        message = json.loads(chunk.split('data: ')[1])
+        self.assertEqual((message['current_price'], message['winner']), (2.0, 'Tester'))
+        self.assertEqual(len(events.backend.subscriptions), 0)
@@ -0,0 +1,112 @@
+import csv
+import io
+import json
+from datetime import date, datetime, timedelta
+from flask_testing import TestCase
+
+from . import app, database, User, Item
+from .test_routes import QueryCounter
+from auction_site.cache import cache
+from auction_site.passwords import hash_password
+
+#================================================================
+
+class TestExporting(TestCase):
+
+    def create_app(self):
+        app.config['TESTING'] = True
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        app.config['WTF_CSRF_ENABLED'] = False
+        app.config['LOGIN_DISABLED'] = False
+        return app
+
+
+    def setUp(self):
+        cache.clear()
+        database.create_all()
+
+        for nick, admin in (('Tester', True), ('Seller', False), ('Buyer', False)):
+            database.session.add(User(
+                nick = nick,
+                password = hash_password('testPassword'),
+                register_date = date.today(),
+                admin = admin
+            ))
+
+        # Closed 1-4 days ago by Seller and Tester in turns, every other one won by Buyer, and one open lot
+        for i in range(1, 5):
+            end_date = datetime.utcnow().replace(hour=10) - timedelta(days=i)
+
+            database.session.add(Item(
+                name = f'Item{i}',
+                asking_price = 1.0,
+                current_price = 1.0 + i,
+                start_date = end_date - timedelta(days=1),
+                end_date = end_date,
+                owner_id = 2 if i % 2 else 1,
+                winner_id = 3 if i % 2 else None,
+                status = Item.CLOSED
+            ))
+
+        database.session.add(Item(
+            name = 'Open',
+            start_date = datetime.utcnow(),
+            end_date = datetime.utcnow() + timedelta(days=1),
+            owner_id = 2
+        ))
+        database.session.commit()
+
+
+    def tearDown(self):
+        app.config['LOGIN_DISABLED'] = True
+        database.session.remove()
+        database.drop_all()
+
+
+    def export(self, query=''):
+        response = self.client.get('/items/export' + query)
+        self.assertEqual(response.status_code, 200)
+        return list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+
+#================================================================
+
+    # One query with both nicks joined in, whatever the number of rows
+    def test_export_csv(self):
+        self.assertEqual(self.client.get('/items/export').status_code, 403)
+        self.client.post('/login', data={'nick': 'Tester', 'password': 'testPassword'})
+
+        with QueryCounter() as counter:
+            response = self.client.get('/items/export')
+            rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+
+        # The logged in user and the export
+        self.assertEqual(counter.count, 2)
+        self.assertEqual(response.headers['Content-Disposition'], 'attachment; filename=auctions.csv')
+        self.assertEqual([row['name'] for row in rows], ['Item1', 'Item2', 'Item3', 'Item4'])
+        self.assertEqual((rows[0]['owner'], rows[0]['winner'], rows[0]['current_price']), ('Seller', 'Buyer', '2.0'))
+        self.assertEqual((rows[1]['owner'], rows[1]['winner']), ('Tester', ''))
+
+
+    def test_export_filters(self):
+        self.client.post('/login', data={'nick': 'Tester', 'password': 'testPassword'})
+        day = lambda days: (date.today() - timedelta(days=days)).isoformat()
+
+        self.assertEqual([row['name'] for row in self.export('?seller=Seller')], ['Item1', 'Item3'])
+        self.assertEqual([row['name'] for row in self.export(f'?start={day(3)}&end={day(2)}')], ['Item2', 'Item3'])
+        self.assertEqual(len(self.export('?status=all')), 5)
+        self.assertEqual(self.export('?start=2999-01-01'), [])
+
+        for query in ('?seller=Nobody', '?start=yesterday', '?format=xml', '?status=won'):
+            self.assertEqual(self.client.get('/items/export' + query).status_code, 400)
+
+        response = self.client.get('/items/export?format=jsonl&status=open')
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        self.assertEqual(json.loads(response.get_data(as_text=True))['name'], 'Open')
+
+
+    def test_command(self):
+        result = app.test_cli_runner().invoke(args=['items', 'export', '--format', 'jsonl', '--seller', 'Seller'])
+        rows = [json.loads(line) for line in result.output.splitlines()]
+
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertEqual([(row['name'], row['winner']) for row in rows], [('Item1', 'Buyer'), ('Item3', 'Buyer')])
@@ -0,0 +1,69 @@
+from datetime import date, datetime, timedelta
+from flask_testing import TestCase
+from jinja2 import FileSystemBytecodeCache
+from werkzeug.security import generate_password_hash
+
+from . import app, database, User, Item
+from auction_site.cache import cache
+from auction_site.fragments import fragments
+
+#================================================================
+
+class TestFragments(TestCase):
+
+    def create_app(self):
+        app.config['TESTING'] = True
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        app.config['WTF_CSRF_ENABLED'] = False
+        app.config['LOGIN_DISABLED'] = True
+        return app
+
+
+    def setUp(self):
+        cache.clear()
+        fragments.clear()
+        database.create_all()
+        database.session.add(User(
+            nick = 'Tester',
+            password = generate_password_hash('testPassword', 'sha256'),
+            register_date = date.today()
+        ))
+
+        for i in range(5):
+            database.session.add(Item(
+                name = f'Item{i}',
+                asking_price = 1.0,
+                start_date = datetime.utcnow() - timedelta(hours=1),
+                end_date = datetime.utcnow() + timedelta(days=1, hours=i),
+                owner_id = 1
+            ))
+        database.session.commit()
+
+
+    def tearDown(self):
+        database.session.remove()
+        database.drop_all()
+
+#================================================================
+
+    # A card is rendered once per item version, other pages of the same items reuse it
+    def test_item_cards(self):
+        self.client.get('/items?size=100')
+        self.assertEqual(len(fragments.backend.entries), 5)
+
+        cache.clear()
+        self.client.get('/items?size=100&sort=-current_price')
+        self.assertEqual(len(fragments.backend.entries), 5)
+
+        item = Item.query.get(1)
+        item.current_price = 1234.5
+        database.session.commit()
+
+        cache.clear()
+        response = self.client.get('/items?size=100')
+        self.assertEqual(len(fragments.backend.entries), 6)
+        self.assertIn('Aktualna cena: 1234.5 zł', response.get_data(as_text=True))
+
+
+    def test_bytecode_cache(self):
+        self.assertIsInstance(app.jinja_env.bytecode_cache, FileSystemBytecodeCache)
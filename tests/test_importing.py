@@ -0,0 +1,162 @@
+import io
+import json
+import os
+import tempfile
+from datetime import date, timedelta
+from flask_testing import TestCase
+
+from . import app, database, User, Item
+from auction_site.cache import cache
+from auction_site.importing import import_items
+from auction_site.passwords import hash_password
+from auction_site.times import now, to_local
+
+#================================================================
+
+def item_row(name, days=1, length=2, price='10.5'):
+    start = to_local(now()) + timedelta(days=days)
+
+    return {
+        'name': name,
+        'description': 'Imported item',
+        'asking_price': price,
+        'start_date': start.strftime('%Y-%m-%dT%H:%M'),
+        'end_date': (start + timedelta(days=length)).strftime('%Y-%m-%dT%H:%M'),
+    }
+
+
+def csv_text(rows):
+    header = 'name,description,asking_price,start_date,end_date\n'
+    return header + ''.join(','.join(row.values()) + '\n' for row in rows)
+
+
+class TestImporting(TestCase):
+
+    def create_app(self):
+        app.config['TESTING'] = True
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        app.config['WTF_CSRF_ENABLED'] = False
+        app.config['LOGIN_DISABLED'] = False
+        return app
+
+
+    def setUp(self):
+        cache.clear()
+        database.create_all()
+
+        for nick, admin in (('Tester', True), ('Seller', False)):
+            database.session.add(User(
+                nick = nick,
+                password = hash_password('testPassword'),
+                register_date = date.today(),
+                admin = admin
+            ))
+        database.session.commit()
+
+
+    def tearDown(self):
+        app.config['LOGIN_DISABLED'] = True
+        database.session.remove()
+        database.drop_all()
+
+#================================================================
+
+    # Bad rows are reported by line, the good ones around them are imported in batches
+    def test_import_items(self):
+        rows = [item_row(f'Item{i}') for i in range(5)]
+        rows.insert(2, item_row('Past', days=-2))
+        rows.insert(4, item_row('Reversed', length=-1))
+        rows.insert(5, item_row('Empty', length=0))
+        rows.append(item_row('', price='x'))
+        rows.append(item_row('Free', price='nan'))
+
+        result = import_items(io.StringIO(csv_text(rows)), 'csv', 2, batch_size=2)
+
+        self.assertEqual(result.imported, 5)
+        self.assertEqual([error['line'] for error in result.errors], [4, 6, 7, 10, 11])
+        self.assertEqual(Item.query.filter_by(owner_id=2, status=Item.OPEN).count(), 5)
+
+        item = Item.query.filter_by(name='Item0').first()
+        self.assertEqual(item.current_price, 10.5)
+        self.assertEqual(to_local(item.start_date).strftime('%Y-%m-%dT%H:%M'), rows[0]['start_date'])
+
+
+    def test_import_jsonl(self):
+        text = '\n'.join([json.dumps(item_row('Item')), '{broken', '[1]', ''])
+        result = import_items(io.StringIO(text), 'jsonl', 2, max_errors=1)
+
+        self.assertEqual((result.imported, result.failed), (1, 2))
+        self.assertEqual(len(result.errors), 1)
+
+
+    # Dates of the wrong JSON type fail their own row, not the import
+    def test_import_unhashable_dates(self):
+        bad = dict(item_row('Bad'), start_date=['x'], end_date={'day': 1})
+        text = '\n'.join(json.dumps(row) for row in (item_row('Item'), bad, item_row('Other')))
+        result = import_items(io.StringIO(text), 'jsonl', 2)
+
+        self.assertEqual((result.imported, result.failed), (2, 1))
+        self.assertEqual(result.errors[0]['line'], 2)
+
+
+    # A quoted description may span lines, from a file and from a request body
+    def test_multiline_csv(self):
+        row = item_row('Item')
+        text = 'name,description,asking_price,start_date,end_date\r\n'
+        text += f'Item,"First line\r\nSecond line",1,{row["start_date"]},{row["end_date"]}\r\n'
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'items.csv')
+
+            with open(path, 'w', newline='') as source:
+                source.write(text)
+
+            result = app.test_cli_runner().invoke(args=['items', 'import', path, '--owner', 'Seller'])
+
+        self.assertIn('Imported 1 items', result.output)
+
+        self.client.post('/login', data={'nick': 'Tester', 'password': 'testPassword'})
+        response = self.client.post('/items/import?owner=Seller', data=text.encode(), content_type='text/csv')
+        self.assertEqual(response.json['imported'], 1)
+
+        self.assertEqual([item.description for item in Item.query], ['First line\r\nSecond line'] * 2)
+
+
+    def test_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'items.csv')
+
+            with open(path, 'w') as source:
+                source.write(csv_text([item_row('Item'), item_row('Past', days=-2)]))
+
+            runner = app.test_cli_runner()
+            self.assertNotEqual(runner.invoke(args=['items', 'import', path, '--owner', 'Nobody']).exit_code, 0)
+
+            result = runner.invoke(args=['items', 'import', path, '--owner', 'Seller'])
+
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn('Imported 1 items', result.output)
+        self.assertIn('Line 3:', result.output)
+        self.assertEqual(Item.query.count(), 1)
+
+
+    # Admins only, CSV or JSON lines bodies only, read as a stream
+    def test_endpoint(self):
+        body = csv_text([item_row('Item'), item_row('Other')])
+        url = '/items/import?owner=Seller'
+
+        self.assertEqual(self.client.post(url, data=body, content_type='text/csv').status_code, 403)
+
+        self.client.post('/login', data={'nick': 'Tester', 'password': 'testPassword'})
+        self.assertEqual(self.client.post('/items/import?owner=Nobody', data=body, content_type='text/csv').status_code, 400)
+
+        # What a cross-site form can send is refused, whatever the query string says
+        for content_type in ('text/plain', 'application/x-www-form-urlencoded', 'multipart/form-data'):
+            self.assertEqual(self.client.post(url + '&format=csv', data=body, content_type=content_type).status_code, 415)
+
+        self.assertEqual(Item.query.count(), 0)
+
+        response = self.client.post(url, data=body, content_type='text/csv')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json, {'imported': 2, 'failed': 0, 'errors': []})
+        self.assertEqual(Item.query.filter_by(owner_id=2).count(), 2)
@@ -0,0 +1,92 @@
+import re
+from datetime import date
+from flask_testing import TestCase
+
+from . import app, database, User
+from .test_routes import add_random_items
+from auction_site.cache import cache
+from auction_site.metrics import metrics
+from auction_site.passwords import hash_password
+
+#================================================================
+
+class TestMetrics(TestCase):
+
+    def create_app(self):
+        app.config['TESTING'] = True
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        app.config['WTF_CSRF_ENABLED'] = False
+        app.config['LOGIN_DISABLED'] = False
+        return app
+
+
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+        database.create_all()
+
+        for nick, admin in (('Tester', True), ('Other', False)):
+            database.session.add(User(
+                nick = nick,
+                password = hash_password('testPassword'),
+                register_date = date.today(),
+                admin = admin
+            ))
+        database.session.commit()
+        add_random_items()
+
+
+    def tearDown(self):
+        app.config['LOGIN_DISABLED'] = True
+        app.config['METRICS_TOKEN'] = None
+        metrics.query_budget = 0
+        database.session.remove()
+        database.drop_all()
+
+
+    def sample(self, text, name, endpoint):
+        match = re.search(rf'^{name}{{endpoint="{endpoint}"}} (\S+)$', text, re.M)
+        return float(match.group(1)) if match else None
+
+#================================================================
+
+    # Histograms are readable by admins only
+    def test_endpoint_admin(self):
+        self.client.get('/items')
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+
+        self.client.post('/login', data={'nick': 'Other', 'password': 'testPassword'})
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+
+        self.client.post('/login', data={'nick': 'Tester', 'password': 'testPassword'})
+        response = self.client.get('/metrics')
+        text = response.get_data(as_text=True)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('# TYPE auction_site_sql_queries histogram', text)
+        self.assertEqual(self.sample(text, 'auction_site_request_seconds_count', 'items_all'), 1)
+        self.assertGreater(self.sample(text, 'auction_site_render_seconds_sum', 'items_all'), 0)
+        self.assertGreater(self.sample(text, 'auction_site_sql_seconds_sum', 'items_all'), 0)
+        self.assertIn('auction_site_sql_queries_bucket{endpoint="items_all",le="+Inf"} 1', text)
+
+
+    def test_endpoint_token(self):
+        app.config['METRICS_TOKEN'] = 'secret'
+
+        self.assertEqual(self.client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code, 403)
+        self.assertEqual(self.client.get('/metrics', headers={'Authorization': 'Bearer secret'}).status_code, 200)
+
+
+    # A request over the query budget is logged with its most repeated statement
+    def test_query_budget(self):
+        self.client.get('/items')
+        queries = self.sample(metrics.exposition(), 'auction_site_sql_queries_sum', 'items_all')
+
+        metrics.query_budget = queries - 1
+        cache.clear()
+
+        with self.assertLogs('auction_site.metrics', 'WARNING') as logs:
+            self.client.get('/items')
+
+        self.assertIn(f'GET /items over budget: {int(queries)} queries', logs.output[0])
+        self.assertIn('executed 1 times: SELECT', logs.output[0])
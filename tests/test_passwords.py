@@ -0,0 +1,124 @@
+import threading
+import time
+from datetime import date
+from unittest.mock import patch
+from flask_testing import TestCase
+from werkzeug.security import generate_password_hash
+
+from . import app, database, User
+from auction_site.cache import cache
+from auction_site.passwords import hash_password, verify_password, needs_rehash, check_user_password
+
+#================================================================
+
+class TestPasswords(TestCase):
+
+    def create_app(self):
+        app.config['TESTING'] = True
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        app.config['WTF_CSRF_ENABLED'] = False
+        app.config['LOGIN_DISABLED'] = False
+        return app
+
+
+    def setUp(self):
+        cache.clear()
+        database.create_all()
+        database.session.add(User(
+            nick = 'Tester',
+            password = generate_password_hash('testPassword', 'sha256'),
+            register_date = date.today()
+        ))
+        database.session.commit()
+
+
+    def tearDown(self):
+        app.config['LOGIN_DISABLED'] = True
+        app.config['PASSWORD_VERIFY_TIMEOUT'] = 5
+        database.session.remove()
+        database.drop_all()
+
+#================================================================
+
+    def test_methods(self):
+        for method in ('pbkdf2:sha256:1000', 'scrypt:1024:8:1'):
+            stored = hash_password('testPassword', method, 16)
+
+            self.assertTrue(stored.startswith(method + '$'))
+            self.assertTrue(verify_password(stored, 'testPassword'))
+            self.assertFalse(verify_password(stored, 'wrongPassword'))
+
+        self.assertFalse(verify_password('scrypt:broken', 'testPassword'))
+
+
+    # The old 'sha256' hash is replaced on the first login
+    def test_rehash_on_login(self):
+        self.assertTrue(needs_rehash(User.query.get(1).password))
+
+        response = self.client.post('/login', data={'nick': 'Tester', 'password': 'testPassword'})
+        self.assertEqual(response.status_code, 303)
+
+        database.session.expire_all()
+        stored = User.query.get(1).password
+        self.assertTrue(stored.startswith(app.config['PASSWORD_METHOD'] + '$'))
+        self.assertFalse(needs_rehash(stored))
+        self.assertTrue(verify_password(stored, 'testPassword'))
+
+
+    def test_wrong_password(self):
+        user = User.query.get(1)
+        stored = user.password
+
+        self.assertFalse(check_user_password(user, 'wrongPassword'))
+        self.assertFalse(check_user_password(None, 'testPassword'))
+        self.assertEqual(user.password, stored)
+
+
+    # A verification over the timeout fails instead of holding the request
+    def test_timeout(self):
+        app.config['PASSWORD_VERIFY_TIMEOUT'] = 0.01
+        user = User.query.get(1)
+        user.password = hash_password('testPassword', 'scrypt:16384:8:8', 16)
+        database.session.commit()
+
+        started = time.perf_counter()
+        self.assertFalse(check_user_password(user, 'testPassword'))
+        self.assertLess(time.perf_counter() - started, 0.5)
+
+
+    # New and changed passwords are hashed in the pool, not on the request's thread
+    def test_hash_in_pool(self):
+        threads = list()
+
+        def recorded(*args):
+            threads.append(threading.current_thread().name)
+            return hash_password(*args)
+
+        with patch('auction_site.passwords.hash_password', side_effect=recorded):
+            response = self.client.post('/register', data={'nick': 'New', 'password': 'newPassword'})
+            self.assertEqual(response.status_code, 303)
+
+            self.client.post('/login', data={'nick': 'Tester', 'password': 'testPassword'})
+            response = self.client.post('/user/1', data={'nick': 'Tester', 'old_password': 'testPassword', 'new_password': 'changedPassword'})
+            self.assertEqual(response.status_code, 200)
+
+        # Registration, the rehash of the old 'sha256' hash on login and the change
+        self.assertEqual(len(threads), 3)
+        self.assertTrue(all(name.startswith('passwords') for name in threads))
+
+        database.session.expire_all()
+        self.assertTrue(verify_password(User.query.filter_by(nick='New').first().password, 'newPassword'))
+        self.assertTrue(verify_password(User.query.get(1).password, 'changedPassword'))
+
+
+    def test_register_timeout(self):
+        app.config['PASSWORD_VERIFY_TIMEOUT'] = 0.01
+        app.config['PASSWORD_METHOD'], method = 'scrypt:16384:8:8', app.config['PASSWORD_METHOD']
+
+        try:
+            response = self.client.post('/register', data={'nick': 'New', 'password': 'newPassword'})
+        finally:
+            app.config['PASSWORD_METHOD'] = method
+
+        self.assertEqual(response.status_code, 503)
+        self.assertIsNone(User.query.filter_by(nick='New').first())
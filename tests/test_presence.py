@@ -0,0 +1,149 @@
+import re
+import time
+from datetime import date, timedelta
+from flask import Response
+from flask_testing import TestCase
+from unittest.mock import Mock, patch
+from sqlalchemy import event
+
+from . import app, database, User
+from auction_site.models import UserPresence
+from auction_site.cache import cache
+from auction_site.presence import presence
+from auction_site.passwords import hash_password
+from auction_site.times import now
+
+#================================================================
+
+class TestPresence(TestCase):
+
+    def create_app(self):
+        app.config['TESTING'] = True
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        app.config['WTF_CSRF_ENABLED'] = False
+        app.config['LOGIN_DISABLED'] = False
+        return app
+
+
+    def setUp(self):
+        cache.clear()
+        presence.pending.clear()
+        database.create_all()
+
+        for nick in ('Tester', 'Other'):
+            database.session.add(User(
+                nick = nick,
+                password = hash_password('testPassword'),
+                register_date = date.today()
+            ))
+        database.session.commit()
+
+
+    def tearDown(self):
+        app.config['LOGIN_DISABLED'] = True
+        presence.pending.clear()
+        database.session.remove()
+        database.drop_all()
+
+#================================================================
+
+    # Logging in and out leaves the user table alone, the buffer holds the state
+    def test_login_logout_buffered(self):
+        statements = list()
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(database.engine, 'before_cursor_execute', listener)
+
+        try:
+            response = self.client.post('/login', data={'nick': 'Tester', 'password': 'testPassword'})
+            self.assertEqual(response.status_code, 303)
+            self.assertTrue(presence.pending[1][0])
+
+            self.client.post('/home')
+            self.assertFalse(presence.pending[1][0])
+        finally:
+            event.remove(database.engine, 'before_cursor_execute', listener)
+
+        self.assertFalse([s for s in statements if re.match(r'\s*(UPDATE|INSERT)', s)])
+        self.assertEqual(UserPresence.query.count(), 0)
+
+
+    # One flush writes new and known users in batches, users deleted meanwhile are skipped
+    def test_flush(self):
+        presence.mark(1, True)
+        presence.mark(2, True)
+        self.assertEqual(presence.flush(), 2)
+
+        presence.mark(1, False)
+        presence.seen(2)
+        presence.mark(99, True)
+        self.assertEqual(presence.flush(), 2)
+        self.assertEqual(presence.flush(), 0)
+
+        rows = {p.user_id: p.active for p in UserPresence.query}
+        self.assertEqual(rows, {1: False, 2: True})
+
+
+    # The flush rides on a finished response once the interval has passed
+    def test_flush_scheduled(self):
+        presence.mark(1, True)
+
+        # Later than any flush scheduled by an unclosed response of another test
+        with patch('auction_site.presence.time.monotonic', return_value=time.monotonic() + 10 ** 6):
+            response = presence.schedule(Response('ok'))
+            self.assertTrue(presence.flushing)
+            response.close()
+
+            self.assertFalse(presence.flushing)
+        self.assertTrue(UserPresence.query.get(1).active)
+
+
+    # A response that is never closed does not keep its flush scheduled forever
+    def test_flush_schedule_stale(self):
+        presence.mark(1, True)
+        later = time.monotonic() + 10 ** 6
+
+        with patch('auction_site.presence.time.monotonic', return_value=later):
+            response = presence.schedule(Response('ok'))
+            self.assertFalse(presence.due())
+
+        with patch('auction_site.presence.time.monotonic', return_value=later + 3 * presence.interval):
+            self.assertTrue(presence.due())
+
+        response.close()
+
+
+    # Flushes never overlap, the second one leaves the marks for later
+    def test_flush_exclusive(self):
+        presence.mark(1, True)
+
+        with presence.flush_lock:
+            self.assertEqual(presence.flush(), 0)
+
+        self.assertEqual(presence.flush(), 1)
+
+
+    # An older mark flushed late by another worker does not overwrite a newer logout
+    def test_flush_keeps_newer_state(self):
+        logout = now()
+        database.session.execute(UserPresence.__table__.insert(), {'user_id': 1, 'active': False, 'last_seen': logout})
+        database.session.commit()
+
+        presence.pending[1] = (True, logout - timedelta(seconds=5))
+        presence.flush()
+
+        row = UserPresence.query.get(1)
+        self.assertEqual((row.active, row.last_seen), (False, logout))
+
+
+    # A row another worker inserted in the meantime postpones the flush instead of failing it
+    def test_flush_concurrent_insert(self):
+        presence.mark(1, False)
+        database.session.execute(UserPresence.__table__.insert(), {'user_id': 1, 'active': True, 'last_seen': now() - timedelta(minutes=1)})
+        database.session.commit()
+
+        with patch.object(database.session, 'query', return_value=Mock(**{'outerjoin.return_value.filter.return_value.all.return_value': [(1, None)]})):
+            self.assertEqual(presence.flush(), 0)
+
+        self.assertFalse(presence.pending[1][0])
+        self.assertEqual(presence.flush(), 1)
+        self.assertFalse(UserPresence.query.get(1).active)
@@ -0,0 +1,103 @@
+from datetime import date
+from unittest.mock import patch
+from flask_testing import TestCase
+from werkzeug.security import generate_password_hash
+
+from . import app, database, User
+from .test_routes import QueryCounter
+from .test_cache import FakeRedis
+from auction_site.cache import cache, RedisBackend
+from auction_site.principal import load_principal
+
+#================================================================
+
+class TestPrincipal(TestCase):
+
+    def create_app(self):
+        app.config['TESTING'] = True
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        app.config['WTF_CSRF_ENABLED'] = False
+        app.config['LOGIN_DISABLED'] = True
+        return app
+
+
+    def setUp(self):
+        cache.clear()
+        database.create_all()
+        database.session.add(User(
+            nick = 'Tester',
+            first_name = 'Jan',
+            password = generate_password_hash('testPassword', 'sha256'),
+            register_date = date.today(),
+            admin = True
+        ))
+        database.session.commit()
+
+
+    def tearDown(self):
+        database.session.remove()
+        database.drop_all()
+
+#================================================================
+
+    # id/nick/admin without a query, other columns load the row once
+    def test_principal_cached(self):
+        load_principal('1')
+
+        with QueryCounter() as counter:
+            principal = load_principal('1')
+            self.assertEqual((principal.id, principal.nick, principal.admin), (1, 'Tester', True))
+            self.assertEqual(counter.count, 0)
+
+            self.assertEqual(principal.first_name, 'Jan')
+            self.assertEqual(principal.register_date, date.today())
+            self.assertEqual(counter.count, 1)
+
+
+    # Committed changes and deletes drop the cached copy, rolled back ones do not
+    def test_principal_invalidated(self):
+        load_principal('1')
+        user = User.query.get(1)
+
+        user.nick = 'Renamed'
+        database.session.flush()
+        database.session.rollback()
+        self.assertEqual(load_principal('1').nick, 'Tester')
+
+        user.nick = 'Renamed'
+        database.session.commit()
+        self.assertEqual(load_principal('1').nick, 'Renamed')
+
+        database.session.delete(user)
+        database.session.commit()
+        self.assertIsNone(load_principal('1'))
+
+
+    # Without a shared cache another worker's invalidation is never seen, the copy expires in seconds
+    def test_principal_ttl(self):
+        with patch.object(cache, 'set') as cache_set:
+            load_principal('1')
+            self.assertEqual(cache_set.call_args[0][2], app.config['USER_CACHE_LOCAL_TTL'])
+
+            cache.backend, backend = RedisBackend(FakeRedis()), cache.backend
+
+            try:
+                load_principal('1')
+                self.assertEqual(cache_set.call_args[0][2], app.config['USER_CACHE_TTL'])
+            finally:
+                cache.backend = backend
+
+
+    # A row deleted in another worker gives None instead of an error and logs the user out
+    def test_principal_deleted(self):
+        principal = load_principal('1')
+        User.query.filter_by(id=1).delete()
+        database.session.commit()
+
+        self.assertIsNone(principal.first_name)
+        self.assertIsNone(load_principal('1'))
+
+
+    def test_principal_missing_attribute(self):
+        with self.assertRaises(AttributeError):
+            load_principal('1').no_such_column
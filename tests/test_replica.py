@@ -0,0 +1,69 @@
+import os
+import shutil
+import tempfile
+from datetime import date, datetime, timedelta
+from flask_testing import TestCase
+from werkzeug.security import generate_password_hash
+from unittest.mock import patch
+
+from . import app, database, User, Item
+from auction_site.cache import cache
+
+#================================================================
+
+class TestReplica(TestCase):
+
+    def create_app(self):
+        self.directory = tempfile.mkdtemp()
+        app.config['TESTING'] = True
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(self.directory, 'primary.db')
+        app.config['SQLALCHEMY_BINDS'] = {'replica': 'sqlite:///' + os.path.join(self.directory, 'replica.db')}
+        app.config['WTF_CSRF_ENABLED'] = False
+        app.config['LOGIN_DISABLED'] = True
+        return app
+
+
+    def setUp(self):
+        cache.clear()
+        replica = database.get_engine(app, 'replica')
+
+        # Same rows on both, the replica has not seen the latest name yet
+        for engine, name in ((database.engine, 'PrimaryItem'), (replica, 'ReplicaItem')):
+            database.Model.metadata.create_all(engine)
+            engine.execute(User.__table__.insert(), nick='Tester', password=generate_password_hash('testPassword', 'sha256'),
+                register_date=date.today())
+            engine.execute(Item.__table__.insert(), name=name, current_price=1.0, owner_id=1,
+                start_date=datetime.utcnow() - timedelta(hours=1), end_date=datetime.utcnow() + timedelta(hours=1))
+
+
+    def tearDown(self):
+        database.session.remove()
+        database.Model.metadata.drop_all(database.get_engine(app, 'replica'))
+        database.drop_all()
+        app.config['SQLALCHEMY_BINDS'] = None
+        shutil.rmtree(self.directory)
+
+#================================================================
+
+    # GET handlers read from the replica, writes go to the primary and the writer reads them back
+    def test_replica_routing(self):
+        self.assertIn(b'ReplicaItem', self.client.get('/items').data)
+
+        with patch('auction_site.routes.current_user') as mock_user:
+            mock_user.id = 1
+            response = self.client.post('/item/1', data={'new_price': 2.0})
+            self.assertIn('bid=accepted', response.location)
+
+        self.assertEqual(database.engine.execute('SELECT current_price FROM item').scalar(), 2.0)
+        self.assertEqual(database.get_engine(app, 'replica').execute('SELECT current_price FROM item').scalar(), 1.0)
+        self.assertIn(b'PrimaryItem', self.client.get('/items').data)
+
+        # Another client is not sticky (rendered again, not from the response cache)
+        cache.clear()
+        self.assertIn(b'ReplicaItem', app.test_client().get('/items').data)
+
+        with self.client.session_transaction() as session:
+            session['_primary_until'] = 0
+
+        cache.clear()
+        self.assertIn(b'ReplicaItem', self.client.get('/items').data)
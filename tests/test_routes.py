@@ -1,29 +1,52 @@
-from datetime import date, timedelta
+import re
+from datetime import date, datetime, timedelta
 from random import randint, random
 from flask import Flask
 from flask_testing import TestCase
 from flask_login import LoginManager, login_user, current_user
+from sqlalchemy import event
+from werkzeug.http import http_date
 from werkzeug.security import generate_password_hash
 from unittest.mock import patch, Mock
 
 from . import app, database, User, Item
+from auction_site.cache import cache
 from . import LoginForm, RegisterForm, NewPriceForm, EditUserForm, AddItemForm, EditItemForm
 
 def add_random_items():
     for i in range(randint(1, 21)):
-        random_date = date.today() + timedelta(randint(0, 3))
+        random_date = datetime.utcnow() + timedelta(randint(0, 3))
 
         database.session.add(Item(
             name = f'Item{i}',
             description = 'Test item',
             asking_price = random(),
             start_date = random_date,
-            end_date = random_date + timedelta(randint(0, 3)),
+            end_date = random_date + timedelta(randint(0, 3), hours=1),
             owner_id = 1 
         ))
 
     database.session.commit()
 
+
+class QueryCounter():
+
+    def __init__(self):
+        self.count = 0
+
+
+    def __enter__(self):
+        event.listen(database.engine, 'before_cursor_execute', self.increase)
+        return self
+
+
+    def __exit__(self, *args):
+        event.remove(database.engine, 'before_cursor_execute', self.increase)
+
+
+    def increase(self, *args):
+        self.count += 1
+
 #================================================================
 
 class TestRoutes(TestCase):
@@ -37,6 +60,7 @@ class TestRoutes(TestCase):
 
     
     def setUp(self):
+        cache.clear()
         database.create_all()
 
         database.session.add(User(
@@ -107,10 +131,30 @@ class TestRoutes(TestCase):
 
         with patch('auction_site.routes.current_user') as mock_user:
             mock_user.id = 1
-            response = self.client.post("/items/add", data=form.data)
+            response = self.client.post("/items/add", data=dict(form.data,
+                start_date = form.start_date._value(),
+                end_date = form.end_date._value()
+            ))
             self.assertEqual(response.status_code, 303)
 
 
+    # An auction ending when it starts would never take a bid
+    def test_add_item_post_empty_period(self):
+        form = AddItemForm()
+        form.name.default = 'Item'
+        form.process()
+
+        with patch('auction_site.routes.current_user') as mock_user:
+            mock_user.id = 1
+            response = self.client.post("/items/add", data=dict(form.data,
+                start_date = form.start_date._value(),
+                end_date = form.start_date._value()
+            ))
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Item.query.count(), 0)
+
+
     # Edit item
     def test_item_edit_post(self):
         add_random_items()
@@ -133,4 +177,244 @@ class TestRoutes(TestCase):
 
         with patch('auction_site.routes.current_user', new=User.query.first()):
             response = self.client.post(f"/user/{User.query.first().id}", data=form.data)
-            self.assertEqual(response.status_code, 200)
\ No newline at end of file
+            self.assertEqual(response.status_code, 200)
+
+
+    # Owners and winners are loaded with the items, not per row
+    def test_items_get_query_count(self):
+        for i in range(5):
+            database.session.add(Item(
+                name = f'Item{i}',
+                start_date = datetime.utcnow() - timedelta(hours=1),
+                end_date = datetime.utcnow() + timedelta(hours=1),
+                current_price = 1.0,
+                owner_id = 1,
+                winner_id = 1
+            ))
+        database.session.commit()
+
+        for path in ("/home", "/items", f"/item/{Item.query.first().id}"):
+            database.session.expunge_all()
+
+            with QueryCounter() as counter:
+                response = self.client.get(path)
+
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(counter.count, 3, path)
+
+
+    # Only running auctions are listed
+    def test_items_get_active_only(self):
+        for i, days in enumerate((-2, 0, 2)):
+            database.session.add(Item(
+                name = f'Item{i}',
+                start_date = datetime.utcnow() + timedelta(days, hours=-1),
+                end_date = datetime.utcnow() + timedelta(days, hours=1),
+                owner_id = 1
+            ))
+        database.session.commit()
+
+        response = self.client.get("/items")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'Item1', response.data)
+        self.assertNotIn(b'Item0', response.data)
+        self.assertNotIn(b'Item2', response.data)
+
+
+    # Walk the catalogue page by page in both directions
+    def test_items_get_pagination(self):
+        for i in range(7):
+            database.session.add(Item(
+                name = f'Item{i}',
+                start_date = datetime.utcnow() - timedelta(hours=1),
+                end_date = datetime.utcnow() + timedelta(i % 3, hours=1),
+                owner_id = 1
+            ))
+        database.session.commit()
+
+        expected = [i.id for i in Item.query.order_by(Item.end_date, Item.id)]
+        pages = list()
+        url = "/items?size=3"
+
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append([int(i) for i in re.findall(r'href="/item/(\d+)"', response.data.decode())])
+            links = re.findall(r'href="([^"]*after=[^"]*)"', response.data.decode())
+            url = links[0].replace('&amp;', '&') if links else None
+
+        self.assertEqual([len(p) for p in pages], [3, 3, 1])
+        self.assertEqual(sum(pages, []), expected)
+
+        response = self.client.get(re.findall(r'href="([^"]*before=[^"]*)"', response.data.decode())[0].replace('&amp;', '&'))
+        self.assertEqual([int(i) for i in re.findall(r'href="/item/(\d+)"', response.data.decode())], pages[1])
+
+
+    # Sort and price filter through the query string, facet links keep the other arguments
+    def test_items_get_sorted_filtered(self):
+        for i, price in enumerate([30.0, 120.0, 60.0, 80.0]):
+            database.session.add(Item(
+                name = f'Item{i}',
+                current_price = price,
+                start_date = datetime.utcnow() - timedelta(hours=1),
+                end_date = datetime.utcnow() + timedelta(hours=1),
+                owner_id = 1
+            ))
+        database.session.commit()
+
+        response = self.client.get("/items?sort=-current_price&min_price=50&max_price=100")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(re.findall(r'<h3 class="text-dark text-center my-0">(\w+)</h3>', response.data.decode()), ['Item3', 'Item2'])
+        self.assertIn('href="/items?sort=-current_price&amp;min_price=100&amp;max_price=500"', response.data.decode())
+        self.assertIn('50 - 100 zł (2)', response.data.decode())
+
+
+    # Bid on item
+    def test_item_post(self):
+        database.session.add(Item(
+            name = 'Item',
+            current_price = 1.0,
+            start_date = datetime.utcnow() - timedelta(hours=1),
+            end_date = datetime.utcnow() + timedelta(hours=1),
+            owner_id = 1
+        ))
+        database.session.commit()
+
+        form = NewPriceForm()
+        form.new_price.default = 2.0
+        form.process()
+
+        with patch('auction_site.routes.current_user') as mock_user:
+            mock_user.id = 1
+            response = self.client.post(f"/item/{Item.query.first().id}", data=form.data)
+            self.assertEqual(response.status_code, 303)
+            self.assertIn('bid=accepted', response.location)
+
+
+    # Register user with taken nick
+    def test_register_post_taken_nick(self):
+        form = RegisterForm()
+        form.nick.default = 'Tester'
+        form.password.default = 'password'
+        form.process()
+
+        response = self.client.post('/register', data=form.data)
+        self.assertEqual(response.status_code, 400)
+
+        # Lost race - the nick was taken between the check and the insert
+        with patch.object(User, 'nick_exists', return_value=False):
+            response = self.client.post('/register', data=form.data)
+            self.assertEqual(response.status_code, 400)
+
+        self.assertEqual(User.query.filter_by(nick='Tester').count(), 1)
+
+
+    # Item counts come from one grouped query, not from loading every user's items
+    def test_users_get_query_count(self):
+        for i in range(5):
+            database.session.add(User(
+                nick = f'Seller{i}',
+                password = 'password',
+                register_date = date.today()
+            ))
+        add_random_items()
+        database.session.expunge_all()
+
+        with QueryCounter() as counter:
+            response = self.client.get("/users")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(counter.count, 1)
+        self.assertIn(f'<strong>{Item.query.count()}</strong>'.encode(), response.data)
+
+
+    # Unchanged pages are answered with 304, bids change the ETag
+    def test_item_get_conditional(self):
+        database.session.add(Item(
+            name = 'Item',
+            current_price = 1.0,
+            start_date = datetime.utcnow() - timedelta(hours=1),
+            end_date = datetime.utcnow() + timedelta(hours=1),
+            owner_id = 1
+        ))
+        database.session.commit()
+        item_id = Item.query.first().id
+
+        for path in ("/home", "/items", f"/item/{item_id}"):
+            response = self.client.get(path)
+            etag = response.headers['ETag']
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.last_modified is None, path != f"/item/{item_id}")
+
+            with QueryCounter() as counter:
+                response = self.client.get(path, headers={'If-None-Match': etag})
+
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response.data, b'')
+            self.assertEqual(counter.count, 1)
+
+        version = Item.query.get(item_id).version
+
+        with patch('auction_site.routes.current_user') as mock_user:
+            mock_user.id = 1
+            self.client.post(f"/item/{item_id}", data={'new_price': 2.0})
+
+        database.session.expire_all()
+        self.assertEqual(Item.query.get(item_id).version, version + 1)
+
+        response = self.client.get(f"/item/{item_id}", headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+
+
+    # Listings only revalidate with the ETag, max(updated_at) stays the same when an item is deleted
+    def test_items_get_modified_since(self):
+        for name in ('Item', 'Other'):
+            database.session.add(Item(
+                name = name,
+                current_price = 1.0,
+                start_date = datetime.utcnow() - timedelta(hours=1),
+                end_date = datetime.utcnow() + timedelta(hours=1),
+                owner_id = 1
+            ))
+        database.session.commit()
+
+        since = http_date(datetime.utcnow() + timedelta(minutes=1))
+        self.assertEqual(self.client.get("/items").status_code, 200)
+
+        database.session.delete(Item.query.filter_by(name='Other').first())
+        database.session.commit()
+
+        response = self.client.get("/items", headers={'If-Modified-Since': since})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(b'Other', response.data)
+
+
+    # The listings version moves with owner nicks too, the validator never counts the item table
+    def test_listings_version(self):
+        database.session.add(Item(
+            name = 'Item',
+            current_price = 1.0,
+            start_date = datetime.utcnow() - timedelta(hours=1),
+            end_date = datetime.utcnow() + timedelta(hours=1),
+            owner_id = 1
+        ))
+        database.session.commit()
+
+        etag = self.client.get("/items").headers['ETag']
+        statements = list()
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(database.engine, 'before_cursor_execute', listener)
+
+        try:
+            self.assertEqual(self.client.get("/items", headers={'If-None-Match': etag}).status_code, 304)
+        finally:
+            event.remove(database.engine, 'before_cursor_execute', listener)
+
+        self.assertFalse([statement for statement in statements if 'count(' in statement.lower()])
+
+        User.query.get(1).nick = 'Renamed'
+        database.session.commit()
+
+        response = self.client.get("/items", headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'Renamed', response.data)
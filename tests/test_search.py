@@ -0,0 +1,92 @@
+from datetime import date, datetime, timedelta
+from flask_testing import TestCase
+from werkzeug.security import generate_password_hash
+
+from . import app, database, User, Item
+from auction_site.cache import cache
+from auction_site.search import search_items
+
+#================================================================
+
+class TestSearch(TestCase):
+
+    def create_app(self):
+        app.config['TESTING'] = True
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        app.config['WTF_CSRF_ENABLED'] = False
+        app.config['LOGIN_DISABLED'] = True
+        return app
+
+
+    def setUp(self):
+        cache.clear()
+        database.create_all()
+        database.session.add(User(
+            nick = 'Tester',
+            password = generate_password_hash('testPassword', 'sha256'),
+            register_date = date.today()
+        ))
+
+        lots = [
+            ('Lampa naftowa', 'Mosiężna, sprawna'),
+            ('Stolik kawowy', 'Dębowy, pasuje do lampa'),
+            ('Lampion ogrodowy', 'Na świeczkę'),
+            ('Rower', 'Górski'),
+        ]
+        for name, description in lots:
+            database.session.add(Item(
+                name = name,
+                description = description,
+                start_date = datetime.utcnow() - timedelta(hours=1),
+                end_date = datetime.utcnow() + timedelta(hours=1),
+                owner_id = 1
+            ))
+        database.session.commit()
+
+
+    def tearDown(self):
+        database.session.remove()
+        database.drop_all()
+
+
+    def names(self, phrase):
+        query, rank = search_items(phrase)
+        return [item.name for item, _ in query.order_by(rank, Item.id)]
+
+#================================================================
+
+    # Whole words anywhere, prefixes only in the name, name hits first
+    def test_search_ranking_and_prefix(self):
+        self.assertEqual(self.names('lampa'), ['Lampa naftowa', 'Stolik kawowy'])
+        self.assertEqual(self.names('LAMP'), ['Lampa naftowa', 'Lampion ogrodowy'])
+        self.assertEqual(self.names('lamp naft'), ['Lampa naftowa'])
+        self.assertEqual(self.names('sprawna'), ['Lampa naftowa'])
+        self.assertEqual(search_items('"*:'), (None, None))
+
+
+    # Triggers keep the index in step with edits and deletes, ended lots are left out
+    def test_search_index_sync(self):
+        bike = Item.query.filter_by(name='Rower').first()
+        bike.name = 'Rower miejski'
+        database.session.delete(Item.query.filter_by(name='Lampion ogrodowy').first())
+        Item.query.filter_by(name='Lampa naftowa').update({Item.end_date: datetime.utcnow() - timedelta(1)})
+        database.session.commit()
+
+        self.assertEqual(self.names('miejski'), ['Rower miejski'])
+        self.assertEqual(self.names('lamp'), [])
+
+
+    # The page and the API page through ranked results
+    def test_search_routes(self):
+        response = self.client.get('/search?q=lamp&size=1')
+        self.assert200(response)
+        self.assertIn('Lampa naftowa', response.data.decode())
+        self.assertNotIn('Lampion ogrodowy', response.data.decode())
+        self.assertIn('Następna strona', response.data.decode())
+
+        first = self.client.get('/api/v1/items/search?q=lamp&size=1').json
+        second = self.client.get(first['next']).json
+        self.assertEqual([item['name'] for item in first['items'] + second['items']], ['Lampa naftowa', 'Lampion ogrodowy'])
+        self.assertIsNone(second['next'])
+        self.assert400(self.client.get('/api/v1/items/search?q=+'))
+        self.assert200(self.client.get('/search'))